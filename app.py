@@ -14,9 +14,14 @@ st.set_page_config(
 )
 
 # Load Custom CSS
-def load_css():
+# The stylesheet is read from disk once per process, not on every rerun
+@st.cache_resource
+def read_css():
     with open("core/styles.css", "r") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        return f.read()
+
+def load_css():
+    st.markdown(f"<style>{read_css()}</style>", unsafe_allow_html=True)
 
 try:
     load_css()
@@ -24,7 +29,217 @@ except FileNotFoundError:
     st.error("core/styles.css not found. Please ensure project structure is correct.")
 
 from core import utils
-import io
+from core.report import ReportStreamParser, SystemMessage, parse_report, render_markdown, deadline_seconds, DEPTH_SCORE, DEPTH_SINGLE, DEPTH_FULL, DEPTH_SEGMENTS
+from core import segments
+from core.incremental import IncrementalPlan, verdict_for
+from core.memory import session_memory
+from core.jobs import job_pool, DONE, FAILED
+from core.ensemble import ensemble_score, is_borderline
+from core.sampling import PdfPages, sample_pdf_score, SAMPLE_MIN_PAGES, SAMPLE_DEADLINE_SECONDS
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import uuid
+
+# Label -> (analysis depth, language)
+DEPTH_OPTIONS = {
+    "⚡ Score only / 僅分數": (DEPTH_SCORE, "en"),
+    "English report": (DEPTH_SINGLE, "en"),
+    "中文報告": (DEPTH_SINGLE, "zh-TW"),
+    "Full bilingual / 完整雙語": (DEPTH_FULL, "en"),
+}
+
+# Label -> segmentation level for per-segment highlights (None = off)
+HIGHLIGHT_OPTIONS = {
+    "Off / 關閉": None,
+    "Sentences / 逐句": segments.SENTENCE,
+    "Paragraphs / 逐段": segments.PARAGRAPH,
+}
+
+# How often the result panel refreshes while a background analysis runs
+JOB_POLL_SECONDS = 0.5
+
+def render_gauge(score, verdict=None):
+    """AI-probability gauge; a missing score is shown as such rather than as 0%."""
+    if score is None:
+        st.warning("The model did not return a score. / 模型未回傳分數。")
+        return
+    color = '#ff4b4b' if score > 50 else '#00cc99'
+    st.markdown(f"""
+    <div style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 15px;">
+        <div style="text-align: center; width: 100%;">
+            <h2 style="margin:0; color: {color};">{score}%</h2>
+            <span style="font-size: 0.8em; opacity: 0.7;">AI Probability / AI 可能性</span>
+            {f'<div style="margin-top: 4px;">{verdict}</div>' if verdict else ''}
+        </div>
+    </div>
+    <div style="background: rgba(255,255,255,0.1); height: 8px; border-radius: 4px; overflow: hidden; margin-bottom: 20px;">
+        <div style="background: {color}; width: {score}%; height: 100%;"></div>
+    </div>
+    """, unsafe_allow_html=True)
+
+def render_analysis(placeholder, text):
+    placeholder.markdown(
+        '<div style="background: rgba(255,255,255,0.05); padding: 20px; border-radius: 12px; border: 1px solid rgba(255,255,255,0.1);">\n\n'
+        + text
+        + '\n\n</div>',
+        unsafe_allow_html=True
+    )
+
+def load_file_text(session_id, uploaded):
+    """
+    Extracted text of the current upload, parsed once and held in the session's memory budget.
+    If it gets evicted under memory pressure it is re-parsed from the upload on demand.
+    """
+    cached = session_memory.get(session_id, "source_file")
+    if cached and cached["file_id"] == uploaded.file_id:
+        return cached["text"]
+    data, mime_type, file_id = uploaded.getvalue(), uploaded.type, uploaded.file_id
+    parse = lambda: {"file_id": file_id, "text": utils.extract_text(data, mime_type)}
+    return session_memory.put(session_id, "source_file", parse(), recompute=parse)["text"]
+
+@st.cache_resource
+def get_speculator():
+    """One background speculation pool per process, shared by all sessions."""
+    from core.api import gemini
+    from core.speculation import Speculator
+    return Speculator(gemini)
+
+def load_page_count(session_id, uploaded):
+    """Page count of an uploaded PDF, read without extracting any page text."""
+    cached = session_memory.get(session_id, "source_pages")
+    if cached and cached["file_id"] == uploaded.file_id:
+        return cached["pages"]
+    pages = PdfPages(uploaded.getvalue()).count
+    session_memory.put(session_id, "source_pages", {"file_id": uploaded.file_id, "pages": pages})
+    return pages
+
+def session_is_active(session_id):
+    return runtime.get_instance().is_active_session(session_id)
+
+def current_session_id():
+    """Streamlit's own session id, so memory held for a session can be released once it disconnects."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else uuid.uuid4().hex
+
+def render_highlights(placeholder, text, report):
+    legend = (
+        '<div style="font-size: 0.8em; opacity: 0.7; margin-top: 12px;">'
+        '<span style="background: rgba(255,75,75,0.5); padding: 0 6px; border-radius: 3px;">AI</span> '
+        '<span style="background: rgba(0,204,153,0.5); padding: 0 6px; border-radius: 3px;">Human / 人類</span> '
+        '— hover a segment for its score / 滑鼠移至句子可查看分數'
+        + (f'<br>{report["note"]}' if report.get("note") else '')
+        + '</div>'
+    )
+    render_analysis(placeholder, segments.render_highlights(text, report["spans"], report["segment_array"]) + legend)
+
+def analysis_job(job):
+    """
+    Runs on the shared job pool, off the script thread. Streams the response into the job
+    (the result panel polls it) and returns the parsed report.
+    With a `highlight` level every segment is scored in the same single request.
+    """
+    params = job.params
+    if params["highlight"] == segments.PARAGRAPH:
+        return incremental_job(job)
+    if params.get("ensemble"):
+        return ensemble_job(job)
+    if params.get("sample"):
+        return sampled_job(job)
+
+    spans = None
+    depth = params["depth"]
+    prompt = params["text"]
+    if params["highlight"]:
+        depth = DEPTH_SEGMENTS
+        spans = segments.segment_text(params["text"], params["highlight"])
+        prompt = segments.numbered_text(params["text"], spans)
+
+    # Call Gemini API, streaming so the score can render before the explanation
+    from core.api import gemini
+    for chunk in gemini.generate_response_stream(
+        prompt,
+        chat_history=[],
+        file_uris=params["rag_files"],
+        tenant=job.session_id,
+        depth=depth,
+        language=params["language"],
+        deadline=job.deadline
+    ):
+        if isinstance(chunk, SystemMessage):
+            # The answer broke off mid-stream: show the message alone, not next to broken JSON
+            job.replace(chunk)
+        else:
+            job.emit(chunk)
+        if job.cancelled:
+            break
+
+    report = parse_report(job.text())
+    if spans is not None and report["structured"]:
+        report["spans"] = spans
+        report["segment_array"] = segments.align_scores(len(spans), report["segment_scores"])
+        if report["score"] is None:
+            report["score"] = segments.weighted_score(spans, report["segment_array"])
+    return report
+
+def ensemble_job(job):
+    """Score-only pass on several models at once; ends as soon as enough of them agree."""
+    from core.api import gemini
+    job.status = "Asking several models, stopping once they agree... / 多個模型同時評分中..."
+    return ensemble_score(gemini, job.params["text"], job.params["rag_files"], tenant=job.session_id, deadline=job.deadline)
+
+def sampled_job(job):
+    """Large PDF: scores a seeded, stratified sample of pages until the estimate is stable."""
+    from core.api import gemini
+    job.status = "Sampling pages... / 抽樣頁面中..."
+    return sample_pdf_score(
+        gemini, job.inputs["pdf"], job.params["rag_files"], tenant=job.session_id, deadline=job.deadline,
+        on_progress=lambda message: setattr(job, "status", message)
+    )
+
+def incremental_job(job):
+    """
+    Paragraph mode. Paragraphs scored before (in any session) come from the paragraph cache;
+    only changed or new ones are sent, so an edit costs in proportion to its size.
+    """
+    plan = IncrementalPlan(job.params["text"], job.params["rag_files"])
+    from core.api import gemini
+    sent = []
+    while plan.needs_request and not job.cancelled:
+        batch = plan.next_batch()
+        job.status = f"Scoring {len(batch)} changed paragraphs... / 正在分析 {len(batch)} 個變更段落..."
+        response = parse_report(gemini.generate_response(
+            plan.prompt(batch),
+            file_uris=job.params["rag_files"],
+            tenant=job.session_id,
+            depth=DEPTH_SEGMENTS,
+            deadline=job.deadline
+        ))
+        if not response["structured"]:
+            # System message (busy / timeout / unavailable): show it as is
+            return response
+        if not plan.merge(batch, response["segment_scores"]):
+            break
+        sent.extend(batch.tolist())
+
+    score = plan.document_score()
+    return {
+        "score": score,
+        "verdict": verdict_for(score),
+        "observations": [],
+        "reasoning": "",
+        "segment_scores": [],
+        "structured": True,
+        "spans": plan.spans,
+        "segment_array": plan.scores,
+        "note": f"Analyzed {len(sent)} of {len(plan.spans)} paragraphs ({plan.sent_fraction(sent):.0%} of the text), "
+                f"the rest reused earlier results. / 已分析 {len(sent)} / {len(plan.spans)} 段，其餘沿用先前結果。",
+    }
+
+def render_report(placeholder, source_text, report):
+    if "spans" in report:
+        render_highlights(placeholder, source_text, report)
+    else:
+        render_analysis(placeholder, render_markdown(report))
 
 # Main Layout
 def main():
@@ -57,9 +272,20 @@ def main():
     # Initialize state
     if "input_mode" not in st.session_state:
         st.session_state.input_mode = "text"
+    if "session_id" not in st.session_state:
+        # Identifies this browser session for fair scheduling of API calls and memory accounting
+        st.session_state.session_id = current_session_id()
+    if runtime.exists():
+        # Frees results, parsed files, background jobs and pending speculation of sessions that have disconnected
+        for ended in session_memory.sweep(session_is_active, job_pool.sessions()):
+            job_pool.release(ended)
+        if st.session_state.get("speculate"):
+            # Speculation only gains sessions while someone uses it, so that's when to prune it
+            get_speculator().sweep(session_is_active)
     
     # Input Area based on mode
     source_text = ""
+    sampled_pdf = None
     if st.session_state.input_mode == "text":
         user_input = st.text_area(
             "Content", 
@@ -73,89 +299,276 @@ def main():
     elif st.session_state.input_mode == "file":
         uploaded_source = st.file_uploader("Choose a file to analyze (TXT/PDF/MD)", type=['txt', 'pdf', 'md'], key="source_uploader")
         if uploaded_source:
-            # Read file content immediately for analysis
+            # Read file content immediately for analysis (parsed once per distinct file)
             try:
-                import PyPDF2
+                page_count = 0
                 if uploaded_source.type == "application/pdf":
-                    pdf_reader = PyPDF2.PdfReader(uploaded_source)
-                    source_text = ""
-                    for page in pdf_reader.pages:
-                        source_text += page.extract_text()
+                    page_count = load_page_count(st.session_state.session_id, uploaded_source)
+                if page_count >= SAMPLE_MIN_PAGES and st.toggle(
+                    "📑 Sample pages / 抽樣頁面",
+                    value=True,
+                    key="sample_pages",
+                    help="Reads and scores a fixed-seed, stratified sample of pages until the score is stable, "
+                         "instead of the whole file. / 以固定種子分層抽樣頁面評分，分數穩定即停止。"
+                ):
+                    sampled_pdf = uploaded_source
+                    st.info(f"Large PDF: {page_count} pages. Only a sample of pages will be read. / 大型 PDF：僅讀取抽樣頁面。")
                 else:
-                    # For TXT and Markdown
-                    stringio = io.StringIO(uploaded_source.getvalue().decode("utf-8"))
-                    source_text = stringio.read()
-                
-                st.info(f"File loaded: {len(source_text)} characters.")
+                    source_text = load_file_text(st.session_state.session_id, uploaded_source)
+                    st.info(f"File loaded: {len(source_text)} characters.")
             except Exception as e:
                 st.error(f"Error reading file: {e}")
         else:
             st.info("Upload a file to begin analysis.")
     
+    # Analysis depth: most checks only need the score, the report can follow on demand
+    # A sampled PDF always gets per-page scores and a coverage summary, so these don't apply
+    sampling = sampled_pdf is not None
+    depth_label = st.radio(
+        "Analysis depth / 分析深度",
+        list(DEPTH_OPTIONS),
+        horizontal=True,
+        key="depth_choice",
+        disabled=sampling
+    )
+    highlight_label = st.radio(
+        "Highlights / 逐句標示",
+        list(HIGHLIGHT_OPTIONS),
+        horizontal=True,
+        key="highlight_choice",
+        disabled=sampling,
+        help="Scores every sentence or paragraph in one request and tints the text. Paragraph mode only re-sends "
+             "paragraphs you changed. / 單次請求為每句或每段評分並標色；逐段模式只重送修改過的段落。"
+    )
+    if sampling:
+        st.caption("Depth and highlights don't apply to sampled PDFs: the result is a per-page estimate with its coverage. "
+                   "/ 抽樣模式不套用分析深度與標示，結果為抽樣頁面的估計值與涵蓋率。")
+    speculate = st.toggle(
+        "⚡ Pre-analyze while idle / 閒置時預先分析",
+        key="speculate",
+        help="Starts the score-only check in the background once your input settles, when the server has spare "
+             "capacity, so the result is ready on click. / 輸入穩定且伺服器有餘裕時先在背景評分。"
+    )
+    rag_files = st.session_state.get("rag_files", [])
+    # Only a score-only click takes the result; for reports it is only worth it to warm the context cache
+    if speculate and source_text and not HIGHLIGHT_OPTIONS[highlight_label] and (
+        DEPTH_OPTIONS[depth_label][0] == DEPTH_SCORE or get_speculator().handler.caches_context(source_text, rag_files)
+    ):
+        get_speculator().submit(st.session_state.session_id, source_text, rag_files)
+    elif speculate:
+        get_speculator().cancel(st.session_state.session_id)
+
     # Analyze Button
     st.markdown('<div class="check-btn-container">', unsafe_allow_html=True)
     analyze_btn = st.button("Check for AI Content", type="primary", use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
+    if analyze_btn:
+        if sampled_pdf is not None:
+            request_analysis({
+                "text": f"{sampled_pdf.name} ({sampled_pdf.file_id})",
+                "depth": DEPTH_SEGMENTS,
+                "language": "en",
+                "highlight": None,
+                "sample": sampled_pdf.file_id,
+            }, timeout=SAMPLE_DEADLINE_SECONDS, pdf=sampled_pdf.getvalue())
+        elif source_text:
+            depth, language = DEPTH_OPTIONS[depth_label]
+            highlight = HIGHLIGHT_OPTIONS[highlight_label]
+            request_analysis({
+                "text": source_text,
+                "depth": DEPTH_SEGMENTS if highlight else depth,
+                "language": language,
+                "highlight": highlight,
+            })
+        else:
+            st.warning("Please input text or upload a file.")
+
     # Result Section
     st.markdown("---")
     st.markdown("### 🔍 Analysis Result / 分析結果")
-    result_container = st.container()
-    
-    with result_container:
-        if analyze_btn:
-            if source_text:
-                placeholder = st.empty()
-                # Call Gemini API
-                from core.api import gemini
-                response_text = gemini.generate_response(
-                    source_text, 
-                    chat_history=[], 
-                    file_uris=st.session_state.get("rag_files", [])
-                )
-                
-                # Try to parse a score
-                import re
-                match = re.search(r"<<SCORE:(\d+)>>", response_text)
-                score = int(match.group(1)) if match else 0
-                
-                # Remove the score tag
-                display_text = re.sub(r"<<SCORE:\d+>>", "", response_text).strip()
-                
-                # Display Gauge
-                st.markdown(f"""
-                <div style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 15px;">
-                    <div style="text-align: center; width: 100%;">
-                        <h2 style="margin:0; color: {'#ff4b4b' if score > 50 else '#00cc99'};">{score}%</h2>
-                        <span style="font-size: 0.8em; opacity: 0.7;">AI Probability / AI 可能性</span>
-                    </div>
-                </div>
-                <div style="background: rgba(255,255,255,0.1); height: 8px; border-radius: 4px; overflow: hidden; margin-bottom: 20px;">
-                    <div style="background: {'#ff4b4b' if score > 50 else '#00cc99'}; width: {score}%; height: 100%;"></div>
-                </div>
-                """, unsafe_allow_html=True)
-
-                # Stream Analysis Text
-                full_response = ""
-                for chunk in utils.stream_text(display_text):
-                    full_response += chunk
-                    placeholder.markdown(f"""
-                    <div style="background: rgba(255,255,255,0.05); padding: 20px; border-radius: 12px; border: 1px solid rgba(255,255,255,0.1);">
-                        {full_response}▌
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                # Final clean render
-                placeholder.markdown(f"""
-                <div style="background: rgba(255,255,255,0.05); padding: 20px; border-radius: 12px; border: 1px solid rgba(255,255,255,0.1);">
-                    {full_response}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.warning("Please input text or upload a file.")
-        else:
-            st.info("Awaiting input for analysis... / 等待輸入進行分析...")
+    if current_job():
+        job_panel()
+    else:
+        result_panel()
+
+    with st.expander("⚙️ Diagnostics / 系統狀態"):
+        render_memory_metrics(st.session_state.session_id)
+        render_backend_metrics()
+
+def render_memory_metrics(session_id):
+    metrics = session_memory.metrics()
+    mine = metrics["per_session"].get(session_id, {"resident_bytes": 0, "offloaded_bytes": 0, "items": 0})
+    mb = lambda n: f"{n / 1024 / 1024:.1f} MB"
+    m_col1, m_col2, m_col3 = st.columns(3)
+    m_col1.metric("This session / 本工作階段", mb(mine["resident_bytes"]), f"{mb(mine['offloaded_bytes'])} on disk", delta_color="off")
+    m_col2.metric(
+        "All sessions / 全部", mb(metrics["resident_bytes"]),
+        f"budget {mb(metrics['budget_bytes'])}", delta_color="off"
+    )
+    m_col3.metric("Evictions / 釋出次數", metrics["evictions"], f"{metrics['sessions']} sessions", delta_color="off")
+
+def render_backend_metrics():
+    """Queue, model, API key, job and speculation counters shared by all sessions."""
+    try:
+        from core.api import gemini
+    except Exception as e:
+        st.caption(f"API handler not available / API 尚未就緒: {e}")
+        return
+
+    jobs = job_pool.metrics()
+    speculation = get_speculator().metrics()
+    j_col1, j_col2, j_col3 = st.columns(3)
+    j_col1.metric("Jobs running / 執行中", jobs["running"], f"{jobs['queued']} queued", delta_color="off")
+    j_col2.metric("Jobs finished / 已完成", jobs["done"], f"{jobs['failed']} failed, {jobs['cancelled']} cancelled", delta_color="off")
+    j_col3.metric(
+        "Pre-analyses reused / 預先分析沿用", speculation["reused"],
+        f"{speculation['started']} started, {speculation['skipped']} skipped", delta_color="off"
+    )
+
+    st.markdown("**Queue / 佇列** (wait in ms)")
+    st.table([dict(priority=p, **m) for p, m in gemini.scheduler.metrics().items()])
+    st.markdown("**Models / 模型**")
+    st.table([
+        {
+            "model": model,
+            "latency_s": ", ".join(f"{d} {v}" for d, v in m["latency_s"].items()) or "-",
+            "error_rate": m["error_rate"],
+            "consecutive_failures": m["consecutive_failures"],
+        }
+        for model, m in gemini.router.metrics().items()
+    ])
+    st.markdown("**API keys / 金鑰**")
+    st.table([dict(key=label, **m) for label, m in gemini.credentials.metrics().items()])
+
+ANALYSIS_KEYS = ("text", "depth", "language", "highlight", "ensemble", "sample")
+
+def same_analysis(a, b):
+    return bool(a and b) and all(a.get(k) == b.get(k) for k in ANALYSIS_KEYS)
+
+def is_scored(report):
+    """False for system messages (busy, timed out, cancelled, ...), which a new click should retry."""
+    return bool(report) and report["structured"] and report["score"] is not None
+
+def current_job():
+    """The session's background analysis not yet collected (survives reruns via its id)."""
+    return job_pool.get(st.session_state.get("analysis_job"))
+
+def request_analysis(params, timeout=None, **inputs):
+    """
+    Starts a background analysis unless the same one is already on screen or running.
+    `inputs` are extra job inputs (e.g. file bytes) that are not kept with the result.
+    """
+    session_id = st.session_state.session_id
+    last = session_memory.get(session_id, "last_analysis")
+    if same_analysis(last, params) and is_scored(last["report"]):
+        # Same input and tier as what's on screen: no need to ask the API again
+        return
+    running = current_job()
+    if running and not running.done and same_analysis(running.params, params):
+        return
+
+    # Errors from the previous attempt stay on screen until something new is requested
+    st.session_state.pop("job_error", None)
+    st.session_state.pop("job_notice", None)
+    speculated = None
+    if params["depth"] == DEPTH_SCORE and not params.get("ensemble") and st.session_state.get("speculate"):
+        speculated = get_speculator().take(session_id, params["text"], st.session_state.get("rag_files", []))
+    if speculated and is_scored(parse_report(speculated)):
+        # Pre-analyzed in the background while the input sat unchanged
+        session_memory.put(session_id, "last_analysis", dict(params, report=parse_report(speculated)))
+        return
+
+    if running:
+        running.cancel()
+        job_pool.forget(running.id)
+    if timeout is None:
+        timeout = deadline_seconds(DEPTH_SEGMENTS if params.get("highlight") else params["depth"])
+    job = job_pool.submit(
+        session_id, analysis_job, dict(params, rag_files=st.session_state.get("rag_files", [])), timeout=timeout, inputs=inputs
+    )
+    st.session_state.analysis_job = job.id
+
+def collect_job(job):
+    """Moves a finished job's report into the session's result slot."""
+    st.session_state.pop("analysis_job", None)
+    job_pool.forget(job.id)
+    if job.state == DONE and is_scored(job.result):
+        params = {k: job.params.get(k) for k in ANALYSIS_KEYS}
+        session_memory.put(st.session_state.session_id, "last_analysis", dict(params, report=job.result))
+    elif job.state == DONE and job.result is not None:
+        # Shown once and not kept, so clicking again on the same input retries
+        st.session_state.job_notice = render_markdown(job.result)
+    elif job.state == FAILED:
+        st.session_state.job_error = str(job.error)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_panel():
+    """
+    Shows a running background analysis. Polls the job instead of waiting on it, so
+    the script thread is never blocked by slow calls or retry backoffs.
+    """
+    job = current_job()
+    if job is None or job.done:
+        if job is not None:
+            collect_job(job)
+        st.rerun()
+
+    parser = ReportStreamParser()
+    parser.feed(job.text())
+    if parser.score is not None:
+        render_gauge(parser.score, parser.verdict)
+    if parser.looks_structured() and parser.partial_reasoning():
+        render_analysis(st.empty(), parser.partial_reasoning() + "▌")
+    else:
+        st.markdown(utils.generate_skeleton_loader(), unsafe_allow_html=True)
+    if job.status:
+        st.caption(job.status)
+    st.button("⏹️ Cancel / 取消", use_container_width=True, on_click=job.cancel)
+
+@st.fragment
+def result_panel():
+    """
+    Result area. Runs as a fragment, so clicks inside it (e.g. Full Report) rerun only
+    this panel, and the last result survives reruns caused by the rest of the page.
+    The result is held in the session's memory budget and may be read back from disk.
+    """
+    if current_job():
+        # Full Report was requested from inside this panel: hand over to the job panel
+        st.rerun()
+
+    analysis = session_memory.get(st.session_state.session_id, "last_analysis")
+    error = st.session_state.get("job_error")
+    notice = st.session_state.get("job_notice")
+    if error:
+        st.error(f"Analysis failed / 分析失敗: {error}")
+    if notice:
+        st.warning(notice)
+    if analysis:
+        render_gauge(analysis["report"]["score"], analysis["report"]["verdict"])
+        render_report(st.empty(), analysis["text"], analysis["report"])
+    elif not (error or notice):
+        st.info("Awaiting input for analysis... / 等待輸入進行分析...")
+
+    if analysis and analysis["depth"] == DEPTH_SCORE:
+        # Same content as the score-only pass, so large inputs reuse its context cache
+        st.button(
+            "📄 Full Report / 完整報告",
+            use_container_width=True,
+            on_click=request_analysis,
+            args=({"text": analysis["text"], "depth": DEPTH_FULL, "language": "en", "highlight": None},)
+        )
+        if not analysis.get("ensemble"):
+            borderline = is_borderline(analysis["report"]["score"])
+            if borderline:
+                st.caption("Borderline score: a cross-check by other models is recommended. / 分數接近中間值，建議多模型複核。")
+            st.button(
+                "🧪 Cross-check with more models / 多模型複核",
+                type="primary" if borderline else "secondary",
+                use_container_width=True,
+                on_click=request_analysis,
+                args=({"text": analysis["text"], "depth": DEPTH_SCORE, "language": "en", "highlight": None, "ensemble": True},)
+            )
 
 if __name__ == "__main__":
     main()
-
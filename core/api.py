@@ -1,19 +1,88 @@
 import os
 import time
+import json
+import hashlib
+import datetime
+import threading
 import google.generativeai as genai
 from google.generativeai import caching
 import logging
-from google.api_core import exceptions
+from core.singleflight import SingleFlight
+from core.scheduler import RequestScheduler, QueueFullError, INTERACTIVE
+from core.router import ModelRouter
+from core.retry import Deadline, DeadlineExceeded, TooSlowForDeadline, RetryPolicy, error_code, is_quota_error
+from core.traffic import TrafficRecorder
+from core.credentials import CredentialPool
+from core.report import ANALYSIS_DEPTHS, DEPTH_FULL, DEPTH_SCORE, SystemMessage, deadline_seconds, depth_instruction, join_stream
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def analysis_fingerprint(system_instruction, history, message_parts, generation_config):
+    """Stable hash of everything that determines an analysis result."""
+    parts = [getattr(p, "name", None) or str(p) for p in message_parts]
+    payload = json.dumps(
+        [system_instruction, history, parts, generation_config],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def estimate_tokens(parts):
+    """Cheap token estimate (~4 UTF-8 bytes per token) without an API round trip."""
+    total = 0
+    for part in parts:
+        if isinstance(part, str):
+            total += len(part.encode("utf-8")) // 4
+        else:
+            # Uploaded file references: use their size when known
+            total += int(getattr(part, "size_bytes", 0) or 0) // 4 or 1000
+    return total
+
+# Inputs at least this large get an explicit context cache so follow-up tiers
+# (e.g. the full report after a score-only pass) don't resend the document.
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096"))
+CONTEXT_CACHE_TTL = datetime.timedelta(minutes=10)
+
+class AnalysisRequest:
+    """A prepared analysis: shared context plus the tier-specific output instruction."""
+
+    def __init__(self, system_instruction, history, content_parts, instruction, generation_config, depth=DEPTH_FULL):
+        self.system_instruction = system_instruction
+        self.history = history
+        self.content_parts = content_parts
+        self.instruction = instruction
+        self.generation_config = generation_config
+        self.depth = depth
+        # Set to run on exactly this model (no fallback chain), e.g. for ensemble members
+        self.model = None
+        self.input_tokens = estimate_tokens(content_parts) + estimate_tokens([system_instruction, instruction])
+        # Filled in while the request runs (for traffic recording)
+        self.model_used = None
+        self.errors = []
+        self.outcome = None
+        self.backend_started = None
+        self.backend_ttfb_s = None
+        self.backend_s = None
+
+    @property
+    def message_parts(self):
+        return self.content_parts + [self.instruction]
+
+    def fingerprint(self):
+        config = dict(self.generation_config, model=self.model) if self.model else self.generation_config
+        return analysis_fingerprint(self.system_instruction, self.history, self.message_parts, config)
+
+    def context_fingerprint(self):
+        """Identifies the reusable part of the request (everything but the output tier)."""
+        return analysis_fingerprint(self.system_instruction, self.history, self.content_parts, None)
+
 class GeminiHandler:
     def __init__(self):
         """Initialize Gemini API client."""
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables.")
+        # One or more keys (GEMINI_API_KEYS); each model call gets its own per-key client
+        self.credentials = CredentialPool.from_env()
+        self.api_key = self.credentials.primary.api_key
+        # The SDK's global configuration is only used for file uploads, so files belong to the primary key's project
         genai.configure(api_key=self.api_key)
         
         # Primary and Fallback Models
@@ -21,15 +90,36 @@ class GeminiHandler:
         # Standard 1.5 models are returning 404s.
         self.primary_model = "gemini-2.5-flash" 
         self.fallback_model = "gemini-2.0-flash-exp" # Guessing another experimental one?
+        # Per-request model order: cheap models for small inputs, measured latency/errors decide the rest.
+        # Pro has a different quota bucket usually; gemini-pro is the legacy 1.0 last resort.
+        self.router = ModelRouter.from_env(
+            ["gemini-2.5-flash-lite", self.primary_model, self.fallback_model, "gemini-1.5-pro", "gemini-pro"]
+        )
 
         
-        # Base generation config
+        # Base generation config (output budget and schema are set per analysis depth)
         self.generation_config = {
             "temperature": 0.2, 
             "top_p": 0.95,
             "max_output_tokens": 8192,
+            # Schema-constrained JSON so the score never has to be scraped from prose
+            "response_mime_type": "application/json",
         }
 
+        # (key index, model, context fingerprint) -> (CachedContent or None, expires_at).
+        # A cache belongs to the project of the key that created it, so it is only used with that key.
+        self._context_caches = {}
+        self._context_lock = threading.Lock()
+
+        # Identical analyses running at the same time share one upstream call
+        self._inflight = SingleFlight()
+        # Bounded, priority-aware admission in front of the model calls
+        self.scheduler = RequestScheduler.from_env()
+        # Backoff/attempt limits; every request also carries one overall Deadline
+        self.retry_policy = RetryPolicy.from_env()
+        # Optional anonymized request-shape capture (GEMINI_TRAFFIC_LOG)
+        self.recorder = TrafficRecorder.from_env()
+
     def upload_file(self, file_path, display_name=None):
         """Uploads a file to Google GenAI."""
         try:
@@ -53,64 +143,134 @@ class GeminiHandler:
             logging.error(f"Upload failed: {e}")
             return None
 
-    def _get_response_with_retry(self, model_name, system_instruction, history, message_parts):
-        """Helper to call API with retries."""
-        max_retries = 3
-        delay = 2 # Initial delay seconds
-        
-        for attempt in range(max_retries):
-            try:
-                model = genai.GenerativeModel(
-                    model_name=model_name,
-                    system_instruction=system_instruction
-                )
-                chat = model.start_chat(history=history)
-                response = chat.send_message(message_parts, generation_config=self.generation_config)
-                return response.text
-                
-            except exceptions.ResourceExhausted as e:
-                # 429 Quota Exceeded
-                logging.warning(f"Quota exceeded for {model_name}. Attempt {attempt+1}/{max_retries}. Retrying in {delay}s...")
-                if attempt == max_retries - 1:
-                    raise e # Re-raise if final attempt
-                time.sleep(delay)
-                delay *= 2 # Exponential backoff
-                
-            except exceptions.ServiceUnavailable as e:
-                # 503 Service Unavailable
-                logging.warning(f"Service unavailable for {model_name}. Retrying in {delay}s...")
-                time.sleep(delay)
-            except Exception as e:
-                # Other errors, maybe fail fast?
-                if "429" in str(e):
-                     # Handle cases where Exception wraps the 429
-                    logging.warning(f"Rate limit hit ({e}). Retrying...")
-                    time.sleep(delay)
-                    delay *= 2
-                else:
-                    raise e
-                    
-        raise Exception("Max retries exceeded.")
+    def _file_owner(self, request):
+        """
+        The credential every call carrying uploaded files must use: files are project-scoped and
+        are uploaded with the primary key, so other keys would get PermissionDenied.
+        """
+        if any(not isinstance(part, str) for part in request.content_parts):
+            return self.credentials.primary
+        return None
+
+    def _wants_context_cache(self, request):
+        return not request.history and estimate_tokens(request.content_parts) >= CONTEXT_CACHE_MIN_TOKENS
+
+    def _cache_owner(self, model_name, request):
+        """The credential holding a live context cache for this request, if any."""
+        fingerprint = request.context_fingerprint()
+        now = time.time()
+        with self._context_lock:
+            for (index, model, fp), (cached, expires_at) in self._context_caches.items():
+                if model == model_name and fp == fingerprint and cached and expires_at > now:
+                    return self.credentials.credentials[index]
+        return None
 
-    def generate_response(self, user_prompt, file_uris=None, chat_history=None):
+    def _cached_context(self, model_name, request, credential, timeout):
         """
-        Generates a response from Gemini, handling rate limits and fallbacks.
+        Returns a CachedContent holding the request's context under `credential`, or None if not worth caching.
+        `timeout` bounds the create call, which counts against the request's deadline like any other.
+        """
+        if not self._wants_context_cache(request):
+            return None
+
+        key = (credential.index, model_name, request.context_fingerprint())
+        now = time.time()
+        with self._context_lock:
+            entry = self._context_caches.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+
+        try:
+            # CachedContent.create only knows the global client, so create it through this key's client
+            create_request = caching.CachedContent._prepare_create_request(
+                model=model_name,
+                system_instruction=request.system_instruction,
+                contents=[{"role": "user", "parts": request.content_parts}],
+                ttl=CONTEXT_CACHE_TTL,
+            )
+            cached = caching.CachedContent._from_obj(credential.client("Cache").create_cached_content(create_request, timeout=timeout))
+            logging.info(f"Created context cache {cached.name} for {model_name} on {credential.label}.")
+        except Exception as e:
+            # Unsupported model or input below the server's minimum; don't retry until expiry
+            logging.warning(f"Context caching unavailable for {model_name}: {e}")
+            cached = None
+
+        with self._context_lock:
+            # Expired entries (and failed attempts) are dropped here, so the table only holds live caches
+            now = time.time()
+            for stale in [k for k, (_, expires_at) in self._context_caches.items() if expires_at <= now]:
+                del self._context_caches[stale]
+            # Expire a little early so we never hand out a cache the server already dropped
+            self._context_caches[key] = (cached, now + CONTEXT_CACHE_TTL.total_seconds() - 30)
+        return cached
+
+    def _get_response_with_retry(self, model_name, request, deadline, stream=False):
+        """
+        Helper to call API with retries, bounded by the request deadline.
+        Every attempt leases an API key from the credential pool, so a retry after a 429
+        goes to another key. With stream=True the streaming response is returned.
         """
-        system_instruction = """
+        use_cache = deadline.allows(self.retry_policy.min_call_seconds * 2)
+        owner = self._file_owner(request)
+
+        def attempt(timeout):
+            attempt_started = time.monotonic()
+            with self.credentials.lease(prefer=self._cache_owner(model_name, request), require=owner) as credential:
+                cached = self._cached_context(model_name, request, credential, timeout) if use_cache else None
+                request.backend_started = time.monotonic()
+                if cached:
+                    # Context (system instruction + document) already lives server-side
+                    model = genai.GenerativeModel.from_cached_content(cached)
+                    chat_history = None
+                    parts = [request.instruction]
+                else:
+                    model = genai.GenerativeModel(
+                        model_name=model_name,
+                        system_instruction=request.system_instruction
+                    )
+                    chat_history = request.history
+                    parts = request.message_parts
+                # Per-key client instead of the SDK's process-wide default
+                model._client = credential.client()
+                try:
+                    response = model.start_chat(history=chat_history).send_message(
+                        parts,
+                        generation_config=request.generation_config,
+                        stream=stream,
+                        # Whatever cache creation used is no longer available to the call itself
+                        request_options={"timeout": max(0.1, timeout - (request.backend_started - attempt_started))}
+                    )
+                except Exception as e:
+                    self.credentials.record(credential, e)
+                    raise
+                self.credentials.record(credential)
+            request.backend_ttfb_s = time.monotonic() - request.backend_started
+            if stream:
+                # The SDK pulls the first chunk eagerly, so quota/availability errors surface here
+                return response
+            return response.text
+
+        expected = self.router.expected_latency(model_name, request.depth)
+        return self.retry_policy.call(
+            attempt, deadline, label=model_name, expected_seconds=expected,
+            on_error=lambda e: request.errors.append(error_code(e)),
+            # Another key still has quota: retry there right away instead of backing off
+            # (not for requests pinned to the key owning their files)
+            retry_now=lambda e: owner is None and is_quota_error(e) and self.credentials.available()
+        )
+
+    def _system_instruction(self):
+        # Kept independent of the analysis depth so one context cache serves every tier
+        return """
         You are an elite AI Content Detection Analyst. Your task is to analyze the input text and determine the likelihood of it being AI-generated.
         
-        **OUTPUT FORMAT REQUIREMENTS:**
-        1. **Confidence Score**: You MUST start your response with exactly this format: `<<SCORE:XX>>` where XX is the percentage (0-100) representing the probability of AI generation.
-        2. **Language**: The rest of your analysis MUST be provided in BOTH **Traditional Chinese (繁體中文)** and **English**.
-        
-        **Analysis Structure:**
-        - **Verdict / 判斷**: A clear statement (Human-written / AI-generated / Mixed).
-        - **Key Observations / 關鍵觀察**: Bullet points highlighting specific linguistic features, perplexity cues, or structural patterns.
-        - **Detailed Analysis / 詳細分析**: In-depth explanation of why you assigned the score.
+        Always answer with JSON, following the output instructions given after the content.
         
         If reference files are provided (RAG context), compare the input style to those documents to inform your decision.
         """
-        
+
+    def _prepare(self, user_prompt, file_uris, chat_history, depth=DEPTH_FULL, language="en"):
+        """Builds the AnalysisRequest for the SDK."""
         # Prepare Chat History
         history_for_sdk = []
         if chat_history:
@@ -118,87 +278,240 @@ class GeminiHandler:
                 role = "user" if msg["role"] == "user" else "model"
                 history_for_sdk.append({"role": role, "parts": [msg["content"]]})
         
-        message_parts = []
+        content_parts = []
         if file_uris:
-            message_parts.extend(file_uris)
-        message_parts.append(user_prompt)
+            content_parts.extend(file_uris)
+        content_parts.append(user_prompt)
+
+        tier = ANALYSIS_DEPTHS[depth]
+        generation_config = dict(
+            self.generation_config,
+            max_output_tokens=tier["max_output_tokens"],
+            response_schema=tier["schema"],
+        )
+        return AnalysisRequest(
+            self._system_instruction(),
+            history_for_sdk,
+            content_parts,
+            depth_instruction(depth, language),
+            generation_config,
+            depth,
+        )
 
-        # Strategy: Try Primary -> Try Fallback -> Try Final -> Return Friendly Error
+    def generate_response(self, user_prompt, file_uris=None, chat_history=None, priority=INTERACTIVE, tenant=None,
+                          depth=DEPTH_FULL, language="en", timeout=None, deadline=None, model=None):
+        """
+        Generates a response from Gemini, handling rate limits and fallbacks.
+        `priority` is INTERACTIVE or BULK; `tenant` identifies the session for fair queueing.
+        `depth` selects the analysis tier (score / single / full); `language` applies to the single tier.
+        `timeout` is the overall budget in seconds (default: the tier's, see report.deadline_seconds).
+        `deadline` passes a Deadline instead, which the caller can cancel to stop the request early.
+        `model` pins the request to one model, skipping routing and fallbacks.
+        """
+        return join_stream(self.generate_response_stream(
+            user_prompt, file_uris, chat_history, priority, tenant, depth, language, timeout, deadline, model
+        ))
+
+    def generate_response_stream(self, user_prompt, file_uris=None, chat_history=None, priority=INTERACTIVE, tenant=None,
+                                 depth=DEPTH_FULL, language="en", timeout=None, deadline=None, model=None):
+        """Same as generate_response, but yields the response text as it arrives."""
+        request = self._prepare(user_prompt, file_uris, chat_history, depth, language)
+        request.model = model
+        if deadline is None:
+            deadline = Deadline(timeout or deadline_seconds(depth))
+        stream = self._follow(request, priority, tenant, deadline)
+        if self.recorder:
+            return self.recorder.wrap(stream, request, priority, tenant)
+        return stream
+
+    def _follow(self, request, priority, tenant, deadline):
+        """
+        Streams the request through the in-flight call shared by identical requests.
+        The shared call runs on its own deadline, cancelled only once every caller has left;
+        this caller's cancel or timeout ends just its own stream.
+        """
+        shared = Deadline(deadline.remaining())
+        finished = yield from self._inflight.stream(
+            request.fingerprint(), self._scheduled_generate, priority, tenant, request, shared,
+            stop=deadline.expired, abandon=shared.cancel
+        )
+        if not finished:
+            yield self._timeout_message(request, deadline)
+
+    def _scheduled_generate(self, priority, tenant, request, deadline):
+        """Waits for a scheduler slot, then streams the request."""
         try:
-            return self._get_response_with_retry(self.primary_model, system_instruction, history_for_sdk, message_parts)
-        except Exception as e_primary:
-            logging.error(f"Primary model {self.primary_model} failed: {e_primary}")
-            
-            # Try Fallback 1 (Flash 8b)
+            with self.scheduler.slot(priority, tenant, timeout=deadline.remaining(), cancelled=lambda: deadline.cancelled):
+                yield from self._generate(request, deadline)
+        except QueueFullError as e:
+            if deadline.cancelled:
+                yield self._timeout_message(request, deadline)
+                return
+            logging.warning(f"Request rejected by scheduler: {e}")
+            request.outcome = "busy"
+            yield f"""⚠️ **Server Busy / 伺服器忙碌中**: 
+Too many analyses are queued right now ({e}). Please try again in a moment.
+"""
+
+    def _model_chain(self, request):
+        """Models to try in order before falling back to auto-discovery."""
+        if request.model:
+            return [request.model]
+        return self.router.route(request.input_tokens, request.depth, request.generation_config["max_output_tokens"])
+
+    def caches_context(self, user_prompt, file_uris=None):
+        """True if this input is large enough for its analyses to share a context cache."""
+        return self._wants_context_cache(self._prepare(user_prompt, file_uris, None, DEPTH_SCORE))
+
+    def ensemble_models(self, user_prompt, file_uris=None, count=3):
+        """The `count` models the router currently ranks best for a score-only pass over this input."""
+        request = self._prepare(user_prompt, file_uris, None, DEPTH_SCORE)
+        return self._model_chain(request)[:count]
+
+    def _generate(self, request, deadline):
+        """Runs the model fallback chain for a prepared request, yielding text chunks."""
+        # Strategy: Try Primary -> Try Fallbacks -> Try Auto-discovered -> Return Friendly Error,
+        # all within one deadline
+        first_error = None
+        for index, model_name in enumerate(self._model_chain(request)):
+            if index > 0:
+                logging.info(f"Switching to fallback model {index}: {model_name}")
             try:
-                logging.info(f"Switching to fallback model 1: {self.fallback_model}")
-                return self._get_response_with_retry(self.fallback_model, system_instruction, history_for_sdk, message_parts)
-            except Exception as e_fallback_1:
-                logging.error(f"Fallback model 1 failed: {e_fallback_1}")
-                
-                # Try Fallback 2 (Pro - different quota bucket usually)
-                try:
-                     logging.info(f"Switching to fallback model 2: gemini-1.5-pro")
-                     return self._get_response_with_retry("gemini-1.5-pro", system_instruction, history_for_sdk, message_parts)
-                except Exception as e_fallback_2:
-                    logging.error(f"Fallback 2 failed: {e_fallback_2}")
-                    
-                    # Try Ultimate Fallback (Legacy 1.0 Pro)
+                response = self._get_response_with_retry(model_name, request, deadline, stream=True)
+            except DeadlineExceeded as e:
+                logging.error(f"Deadline reached: {e}")
+                yield self._timeout_message(request, deadline)
+                return
+            except TooSlowForDeadline as e:
+                # Not the model's fault: a faster model further down the chain may still fit
+                logging.warning(f"Skipping {model_name}: {e}")
+                first_error = first_error or e
+                continue
+            except Exception as e:
+                logging.error(f"Model {model_name} failed: {e}")
+                self.router.record_failure(model_name)
+                first_error = first_error or e
+                continue
+            request.model_used, request.outcome = model_name, "ok"
+            if (yield from self._relay(model_name, response, request, deadline)):
+                # Only the successful attempt counts: backoffs and cache creation say nothing about the model
+                self.router.record_success(model_name, request.depth, request.backend_s)
+            return
+
+        if request.model:
+            # Pinned requests don't wander off to other models
+            request.outcome = "unavailable"
+            yield f"⚠️ **Model Unavailable / 模型無法使用**: {request.model} failed ({str(first_error)[:100]})."
+            return
+
+        if not deadline.allows(self.retry_policy.min_call_seconds * 2):
+            yield self._timeout_message(request, deadline)
+            return
+
+        # Auto-discovery fallback
+        debug_model_list = "List failed"
+        try:
+            logging.info("Attempting auto-discovery of available models...")
+            available_models = []
+            all_models_debug = []
+            with self.credentials.lease() as credential:
+                listed = list(genai.list_models(client=credential.client("Model"), request_options={"timeout": deadline.remaining()}))
+            for m in listed:
+                all_models_debug.append(f"{m.name} ({m.supported_generation_methods})")
+                if 'generateContent' in m.supported_generation_methods:
+                    # Prefer flash models if available
+                    if "flash" in m.name:
+                        available_models.insert(0, m.name)
+                    else:
+                        available_models.append(m.name)
+            
+            debug_model_list = "\n".join(all_models_debug) if all_models_debug else "No models returned by ListModels."
+
+            if available_models:
+                # Try the first 3 discovered models
+                for model_name in available_models[:3]:
                     try:
-                        logging.info(f"Switching to legacy fallback: gemini-pro")
-                        return self._get_response_with_retry("gemini-pro", system_instruction, history_for_sdk, message_parts)
-                    except Exception as e_final:
-                        # Auto-discovery fallback
-                        try:
-                            logging.info("Attempting auto-discovery of available models...")
-                            available_models = []
-                            all_models_debug = []
-                            for m in genai.list_models():
-                                all_models_debug.append(f"{m.name} ({m.supported_generation_methods})")
-                                if 'generateContent' in m.supported_generation_methods:
-                                    # Prefer flash models if available
-                                    if "flash" in m.name:
-                                        available_models.insert(0, m.name)
-                                    else:
-                                        available_models.append(m.name)
-                            
-                            debug_model_list = "\n".join(all_models_debug) if all_models_debug else "No models returned by ListModels."
-
-                            if available_models:
-                                # Try the first 3 discovered models
-                                for model_name in available_models[:3]:
-                                    try:
-                                        logging.info(f"Trying auto-discovered model: {model_name}")
-                                        return self._get_response_with_retry(model_name, system_instruction, history_for_sdk, message_parts)
-                                    except Exception as e:
-                                        logging.warning(f"Auto-discovered model {model_name} failed: {e}")
-                                
-                                raise Exception("All auto-discovered models failed.")
-                            else:
-                                raise Exception(f"No models found with generateContent capability. Visible: {debug_model_list}")
-
-                        except Exception as e_auto:
-                            logging.error(f"Auto-discovery failed: {e_auto}")
-                            # Clean up debug list for display
-                            safe_debug_list = debug_model_list if 'debug_model_list' in locals() else "List failed"
-                            
-                            return f"""⚠️ **System Error / 系統錯誤**: 
+                        logging.info(f"Trying auto-discovered model: {model_name}")
+                        response = self._get_response_with_retry(model_name, request, deadline, stream=True)
+                    except DeadlineExceeded as e:
+                        logging.error(f"Deadline reached: {e}")
+                        yield self._timeout_message(request, deadline)
+                        return
+                    except Exception as e:
+                        logging.warning(f"Auto-discovered model {model_name} failed: {e}")
+                        continue
+                    request.model_used, request.outcome = model_name, "ok"
+                    yield from self._relay(model_name, response, request, deadline)
+                    return
+                
+                raise Exception("All auto-discovered models failed.")
+            else:
+                raise Exception(f"No models found with generateContent capability. Visible: {debug_model_list}")
+
+        except Exception as e_auto:
+            logging.error(f"Auto-discovery failed: {e_auto}")
+
+        request.outcome = "unavailable"
+        yield f"""⚠️ **System Error / 系統錯誤**: 
 All AI models are currently unavailable.
 
 **Diagnosis**:
-The Primary model ({self.primary_model}) hit a 429 Quota limit ({str(e_primary)[:100]}...).
+The models in the routing chain failed; the first error was: {str(first_error)[:100]}...
 We attempted to find other models, but failed.
 
+**API Keys**:
+```
+{self.credentials.summary()}
+```
+
 **Available Models on your Account**:
 ```
-{safe_debug_list}
+{debug_model_list}
 ```
 
 **Action**:
 1. If you see 'gemini-1.5-flash' in the list above, the API names might be mismatching.
-2. If the list is empty or only contains experimental models, your API Key might be restricted.
-3. Please check your [Google AI Studio](https://aistudio.google.com/) API key settings.
+2. If the list is empty or only contains experimental models, the key used for the list might be restricted.
+3. If every key above is resting, they are all out of quota: wait, or add keys to `GEMINI_API_KEYS`.
+4. Please check your [Google AI Studio](https://aistudio.google.com/) API key settings.
 """
 
+    def _relay(self, model_name, response, request, deadline):
+        """
+        Yields the text of a streamed response, returning False if reading it failed.
+        Errors while streaming (e.g. a 504 once the server-side deadline passes) come after
+        text has already gone out, so there is no falling back: the request ends timed out,
+        with a SystemMessage that replaces the partial answer.
+        """
+        try:
+            yield from _iter_text(response)
+        except Exception as e:
+            logging.error(f"Model {model_name} failed while streaming: {e}")
+            request.errors.append(error_code(e))
+            self.router.record_failure(model_name)
+            yield SystemMessage(self._timeout_message(request, deadline))
+            return False
+        request.backend_s = time.monotonic() - request.backend_started
+        return True
+
+    def _timeout_message(self, request, deadline):
+        if deadline.cancelled:
+            request.outcome = "cancelled"
+            return "⏹️ **Cancelled / 已取消**"
+        request.outcome = "timeout"
+        return f"""⏱️ **Timed Out / 請求逾時**: 
+No model could complete the analysis within the {deadline.seconds:.0f}s limit. Please try again shortly.
+"""
+
+def _iter_text(response):
+    """Yields the text of each streamed chunk, skipping chunks without text parts."""
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if text:
+            yield text
+
 # Singleton instance for easy import
 gemini = GeminiHandler()
@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import google.ai.generativelanguage as glm
+from core.retry import is_quota_error, is_retryable, retry_delay_hint
+
+# How long a key rests after a 429 when the server gave no retry delay
+QUOTA_COOLDOWN_SECONDS = 60
+# Consecutive transient errors (5xx) before a key also gets a short rest
+ERROR_COOLDOWN_FAILURES = 3
+ERROR_COOLDOWN_SECONDS = 15
+
+
+class Credential:
+    """One API key with its own SDK clients and health counters."""
+
+    def __init__(self, index, api_key):
+        self.index = index
+        self.api_key = api_key
+        self.label = f"key-{index + 1} (…{api_key[-4:]})"
+        self.in_flight = 0
+        self.last_used = 0.0
+        self.cooling_until = 0.0
+        self.consecutive_errors = 0
+        self.counts = {"ok": 0, "quota": 0, "error": 0}
+        self._clients = {}
+        self._client_lock = threading.Lock()
+
+    def client(self, service="Generative"):
+        """A glm <service>ServiceClient bound to this key (built once, shared by threads)."""
+        with self._client_lock:
+            if service not in self._clients:
+                cls = getattr(glm, f"{service}ServiceClient")
+                self._clients[service] = cls(client_options={"api_key": self.api_key})
+            return self._clients[service]
+
+    def cooldown_left(self, now=None):
+        return max(0.0, self.cooling_until - (now or time.monotonic()))
+
+
+class CredentialPool:
+    """
+    Spreads requests over several API keys (GEMINI_API_KEYS, comma separated).
+    - Each key has its own clients, so requests never touch the SDK's global configuration.
+    - Requests go to the healthy key with the fewest calls in flight, least recently used first.
+    - A 429 rests the key for the server's retry delay (or QUOTA_COOLDOWN_SECONDS);
+      repeated 5xx errors rest it briefly. If every key is resting, the one back soonest is used.
+    """
+
+    def __init__(self, api_keys):
+        if not api_keys:
+            raise ValueError("GEMINI_API_KEY not found in environment variables.")
+        self.credentials = [Credential(i, key) for i, key in enumerate(api_keys)]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        keys = [k.strip() for k in os.getenv("GEMINI_API_KEYS", "").split(",") if k.strip()]
+        if not keys and os.getenv("GEMINI_API_KEY"):
+            keys = [os.getenv("GEMINI_API_KEY")]
+        # Duplicates would only split one quota bucket into two "keys"
+        return cls(list(dict.fromkeys(keys)))
+
+    @property
+    def primary(self):
+        return self.credentials[0]
+
+    def available(self):
+        """True if at least one key is not resting."""
+        now = time.monotonic()
+        return any(c.cooldown_left(now) == 0 for c in self.credentials)
+
+    @contextmanager
+    def lease(self, prefer=None, require=None):
+        """
+        Picks a key for one call and counts it as in flight meanwhile.
+        `prefer` (a Credential) is used when healthy, e.g. the key owning a context cache.
+        `require` is used even when resting, e.g. the key whose project owns the uploaded files.
+        """
+        credential = self._acquire(prefer, require)
+        try:
+            yield credential
+        finally:
+            with self._lock:
+                credential.in_flight -= 1
+
+    def record(self, credential, error=None):
+        """Updates a key's health after a call (error=None means success)."""
+        with self._lock:
+            if error is None:
+                credential.counts["ok"] += 1
+                credential.consecutive_errors = 0
+                return
+            if is_quota_error(error):
+                credential.counts["quota"] += 1
+                rest = retry_delay_hint(error) or QUOTA_COOLDOWN_SECONDS
+                credential.cooling_until = max(credential.cooling_until, time.monotonic() + rest)
+                logging.warning(f"{credential.label} hit its quota; resting it for {rest:.0f}s.")
+            elif is_retryable(error):
+                credential.counts["error"] += 1
+                credential.consecutive_errors += 1
+                if credential.consecutive_errors >= ERROR_COOLDOWN_FAILURES:
+                    credential.cooling_until = time.monotonic() + ERROR_COOLDOWN_SECONDS
+
+    def summary(self):
+        """One line per key for diagnostics, without revealing the keys."""
+        now = time.monotonic()
+        lines = []
+        for c in self.credentials:
+            state = f"resting {c.cooldown_left(now):.0f}s" if c.cooldown_left(now) else "ok"
+            lines.append(f"{c.label}: {state}, {c.counts['ok']} ok / {c.counts['quota']} quota / {c.counts['error']} errors")
+        return "\n".join(lines)
+
+    def metrics(self):
+        now = time.monotonic()
+        return {
+            c.label: dict(c.counts, in_flight=c.in_flight, resting_s=round(c.cooldown_left(now), 1))
+            for c in self.credentials
+        }
+
+    def _acquire(self, prefer, require=None):
+        with self._lock:
+            now = time.monotonic()
+            if require is not None:
+                chosen = require
+            elif prefer is not None and prefer.cooldown_left(now) == 0:
+                chosen = prefer
+            else:
+                chosen = min(
+                    self.credentials,
+                    key=lambda c: (c.cooldown_left(now), c.in_flight, c.last_used, c.index)
+                )
+            chosen.in_flight += 1
+            chosen.last_used = now
+            return chosen
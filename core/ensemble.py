@@ -0,0 +1,125 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from core.retry import Deadline
+from core.report import DEPTH_SCORE, deadline_seconds, join_stream, parse_report
+from core.incremental import verdict_for
+
+# Scores in this band are worth a second (and third) opinion
+BORDERLINE_LOW, BORDERLINE_HIGH = 40, 60
+ENSEMBLE_SIZE = int(os.getenv("GEMINI_ENSEMBLE_SIZE", "3"))
+# Models "agree" when their scores are at most this many points apart
+ENSEMBLE_TOLERANCE = float(os.getenv("GEMINI_ENSEMBLE_TOLERANCE", "10"))
+# How many agreeing models end the ensemble early
+ENSEMBLE_QUORUM = 2
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ensemble")
+
+
+def is_borderline(score):
+    return score is not None and BORDERLINE_LOW <= score <= BORDERLINE_HIGH
+
+
+def consensus(scores, quorum=ENSEMBLE_QUORUM, tolerance=ENSEMBLE_TOLERANCE):
+    """
+    Indices of the tightest group of `quorum` scores lying within `tolerance` of each
+    other, or None if no such group exists yet.
+    """
+    values = np.asarray(scores, dtype=float)
+    if values.size < quorum:
+        return None
+    order = np.argsort(values)
+    ordered = values[order]
+    # Range of every window of `quorum` consecutive sorted scores
+    ranges = ordered[quorum - 1:] - ordered[:values.size - quorum + 1]
+    best = int(np.argmin(ranges))
+    if ranges[best] > tolerance:
+        return None
+    return order[best:best + quorum]
+
+
+def ensemble_score(handler, text, file_uris=None, tenant=None, deadline=None,
+                   size=ENSEMBLE_SIZE, quorum=ENSEMBLE_QUORUM, tolerance=ENSEMBLE_TOLERANCE):
+    """
+    Runs the score-only analysis on `size` models at once and returns as soon as `quorum`
+    of them agree within `tolerance`; the remaining calls are cancelled.
+    Returns a report dict (see parse_report) whose score is the mean of the agreeing
+    models (of all models if they never agree), plus an "ensemble" summary.
+    """
+    deadline = deadline or Deadline(deadline_seconds(DEPTH_SCORE))
+    models = handler.ensemble_models(text, file_uris, size)
+    members = {model: Deadline(deadline.remaining()) for model in models}
+
+    def run(model):
+        chunks = []
+        for chunk in handler.generate_response_stream(
+            text, file_uris=file_uris, tenant=tenant, depth=DEPTH_SCORE, deadline=members[model], model=model
+        ):
+            chunks.append(chunk)
+            if members[model].cancelled:
+                return None
+        return parse_report(join_stream(chunks))
+
+    futures = {_pool.submit(run, model): model for model in models}
+    results = {}   # model -> parsed report with a score
+    agreeing = None
+    pending = set(futures)
+    while pending and agreeing is None and not deadline.cancelled:
+        done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                report = future.result()
+            except Exception as e:
+                logging.warning(f"Ensemble member {futures[future]} failed: {e}")
+                continue
+            if report and report["score"] is not None:
+                results[futures[future]] = report
+        agreeing = consensus([r["score"] for r in results.values()], quorum, tolerance)
+
+    for model in models:
+        # Early exit (or caller cancelled): stop whatever is still queued or streaming
+        if model not in results:
+            members[model].cancel()
+
+    scored = list(results)
+    scores = np.array([results[m]["score"] for m in scored], dtype=float)
+    if not scored:
+        return dict(
+            parse_report(""),
+            reasoning="⚠️ None of the ensemble models returned a score. / 沒有模型回傳分數。",
+            ensemble={"models": models, "scores": {}, "consensus": False},
+        )
+
+    used = scores[agreeing] if agreeing is not None else scores
+    score = int(round(float(used.mean())))
+    spread = float(scores.max() - scores.min())
+    skipped = [m for m in models if m not in results]
+    observations = [f"{m}: {results[m]['score']}% ({results[m]['verdict']})" for m in scored]
+    observations += [f"{m}: no score (stopped early or failed) / 未取得分數" for m in skipped]
+    if len(scored) < quorum:
+        reasoning = (f"Only {len(scored)} of {len(models)} model(s) answered, so there is no cross-check; "
+                     f"the score {score}% is not confirmed by a second model. / "
+                     f"僅 {len(scored)} 個模型回應，無法交叉比對，分數 {score}% 未經複核。")
+    elif agreeing is not None:
+        reasoning = (f"{len(used)} of {len(models)} models agreed within {tolerance:.0f} points; "
+                     f"combined score {score}%, spread {spread:.0f} points across {len(scored)} answers. / "
+                     f"{len(used)} 個模型結果一致，綜合分數 {score}%，差距 {spread:.0f} 分。")
+    else:
+        reasoning = (f"The models disagree (spread {spread:.0f} points, std {float(scores.std()):.1f}); "
+                     f"the combined score {score}% is their mean. Treat the verdict with caution. / "
+                     f"模型意見分歧（差距 {spread:.0f} 分），綜合分數為平均值，請審慎判讀。")
+    return {
+        "score": score,
+        "verdict": verdict_for(score),
+        "observations": observations,
+        "reasoning": reasoning,
+        "segment_scores": [],
+        "structured": True,
+        "ensemble": {
+            "models": models,
+            "scores": {m: results[m]["score"] for m in scored},
+            "consensus": agreeing is not None,
+            "spread": spread if len(scored) >= quorum else None,
+        },
+    }
@@ -0,0 +1,122 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from core import segments
+
+
+def paragraph_key(text, file_uris=None):
+    """
+    Fingerprint of a paragraph, insensitive to whitespace-only edits. The reference files are
+    part of it, since the model scores against them: other files, other score.
+    """
+    normalized = re.sub(r"\s+", " ", text).strip()
+    names = [getattr(f, "name", None) or str(f) for f in file_uris or ()]
+    return hashlib.sha256("\0".join([normalized, *names]).encode("utf-8")).hexdigest()
+
+
+def verdict_for(score):
+    if score is None:
+        return ""
+    if score >= 70:
+        return "AI-generated / AI 生成"
+    if score <= 30:
+        return "Human-written / 人類撰寫"
+    return "Mixed / 混合"
+
+
+class ParagraphScoreCache:
+    """Process-wide LRU of paragraph fingerprint -> AI score."""
+
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        scores = np.full(len(keys), np.nan)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    scores[i] = self._scores[key]
+        return scores
+
+    def put_many(self, keys, scores):
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._scores[key] = float(score)
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.capacity:
+                self._scores.popitem(last=False)
+
+
+paragraph_cache = ParagraphScoreCache()
+
+
+class IncrementalPlan:
+    """
+    Works out which paragraphs of a document still need scoring.
+    Paragraphs seen before (same fingerprint) reuse their cached score; only changed or
+    new ones are sent, each with `context` unchanged neighbours on either side for reference.
+    """
+
+    def __init__(self, text, file_uris=None, cache=paragraph_cache, context=1):
+        self.text = text
+        self.cache = cache
+        self.context = context
+        # No merging cap here: paragraph boundaries must stay stable across edits for the cache to hit
+        self.spans = segments.segment_text(text, segments.PARAGRAPH, max_segments=len(text) + 1)
+        self.keys = [paragraph_key(text[start:end], file_uris) for start, end in self.spans.tolist()]
+        self.scores = cache.get_many(self.keys)
+        self.missing = np.flatnonzero(np.isnan(self.scores))
+
+    @property
+    def needs_request(self):
+        return self.missing.size > 0
+
+    def next_batch(self):
+        """Indices of the next paragraphs to send; one request covers up to MAX_SEGMENTS of them."""
+        return self.missing[:segments.MAX_SEGMENTS]
+
+    def prompt(self, batch):
+        """Prompt body: changed paragraphs keep their document-wide [n] ids, neighbours are marked [context]."""
+        count = len(self.spans)
+        # Indices to show: every batch paragraph plus its neighbours (vectorized window expansion)
+        offsets = np.arange(-self.context, self.context + 1)
+        shown = np.unique(np.clip(batch[:, None] + offsets[None, :], 0, count - 1))
+        to_score = np.isin(shown, batch)
+
+        lines = [
+            "Lines marked [context] are unchanged neighbouring paragraphs, for reference only: "
+            "do NOT include them in segment_scores.",
+        ]
+        previous = None
+        for index, score_it in zip(shown.tolist(), to_score.tolist()):
+            if previous is not None and index != previous + 1:
+                lines.append("[...]")
+            start, end = self.spans[index]
+            label = f"[{index + 1}]" if score_it else "[context]"
+            lines.append(f"{label} {self.text[start:end]}")
+            previous = index
+        return "\n".join(lines)
+
+    def merge(self, batch, segment_scores):
+        """Folds the model's scores for a sent batch into the plan and the cache. Returns how many were scored."""
+        fresh = segments.align_scores(len(self.spans), segment_scores)
+        # Only accept scores for paragraphs we actually asked about
+        accepted = batch[~np.isnan(fresh[batch])]
+        self.scores[accepted] = fresh[accepted]
+        self.cache.put_many([self.keys[i] for i in accepted.tolist()], fresh[accepted])
+        self.missing = np.flatnonzero(np.isnan(self.scores))
+        return accepted.size
+
+    def document_score(self):
+        return segments.weighted_score(self.spans, self.scores)
+
+    def sent_fraction(self, sent_indices):
+        """Share of the document's characters that had to be (re)sent."""
+        lengths = self.spans[:, 1] - self.spans[:, 0]
+        total = lengths.sum()
+        return float(lengths[sent_indices].sum() / total) if total else 0.0
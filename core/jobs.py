@@ -0,0 +1,152 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.retry import Deadline
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Finished jobs stay reachable this long, so a session that reruns late can still collect them
+JOB_RETENTION_SECONDS = 600
+
+
+class Job:
+    """
+    Handle to a background analysis. The worker appends output with emit(); the UI
+    reads it with text() while polling, and can cancel() at any time.
+    """
+
+    def __init__(self, session_id, params, deadline, inputs=None):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.params = params
+        # Large inputs (e.g. file bytes) are only needed while running and are let go after
+        self.inputs = inputs or {}
+        self.deadline = deadline
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.status = ""
+        self.finished_at = None
+        self._chunks = []
+        self._lock = threading.Lock()
+
+    def emit(self, chunk):
+        with self._lock:
+            self._chunks.append(chunk)
+
+    def replace(self, chunk):
+        """Discards the output so far, e.g. a partial answer superseded by an error message."""
+        with self._lock:
+            self._chunks = [chunk]
+
+    def text(self):
+        with self._lock:
+            return "".join(self._chunks)
+
+    def cancel(self):
+        """Stops the job: queue waits and retry backoffs on its deadline end immediately."""
+        self.deadline.cancel()
+
+    @property
+    def cancelled(self):
+        return self.deadline.cancelled
+
+    @property
+    def done(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+
+class JobPool:
+    """
+    Shared worker pool running analyses off the Streamlit script thread.
+    Sessions keep only the job id, so a rerun reattaches to the running job
+    instead of starting another one.
+    """
+
+    def __init__(self, max_workers=16):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._finished = {DONE: 0, FAILED: 0, CANCELLED: 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(max_workers=int(os.getenv("GEMINI_JOB_WORKERS", "16")))
+
+    def submit(self, session_id, fn, params, timeout, inputs=None):
+        """
+        Runs fn(job) in the background and returns the Job.
+        fn should emit() output as it goes, return the result, and stop soon after job.cancelled.
+        `timeout` is the job's overall budget (see report.deadline_seconds).
+        `inputs` are released as soon as the job finishes; `params` stay until it is forgotten.
+        """
+        job = Job(session_id, params, Deadline(timeout), inputs)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def forget(self, job_id):
+        """Drops a job once its result has been collected."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def sessions(self):
+        with self._lock:
+            return {job.session_id for job in self._jobs.values()}
+
+    def release(self, session_id):
+        """Cancels and forgets the jobs of a session that has ended."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.session_id == session_id]
+            for job in jobs:
+                del self._jobs[job.id]
+        for job in jobs:
+            job.cancel()
+
+    def metrics(self):
+        """Jobs queued and running now, and how many have finished in each state so far."""
+        with self._lock:
+            active = [job.state for job in self._jobs.values()]
+            return dict(self._finished, queued=active.count(QUEUED), running=active.count(RUNNING))
+
+    def _run(self, job, fn):
+        if job.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.state = RUNNING
+        try:
+            job.result = fn(job)
+            state = CANCELLED if job.cancelled else DONE
+        except Exception as e:
+            logging.error(f"Background job {job.id[:8]} failed: {e}")
+            job.error = e
+            state = FAILED
+        self._finish(job, state)
+
+    def _finish(self, job, state):
+        job.finished_at, job.inputs = time.time(), {}
+        with self._lock:
+            self._finished[state] += 1
+        job.state = state
+
+    def _prune(self):
+        # Caller holds the lock
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [i for i, j in self._jobs.items() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+job_pool = JobPool.from_env()
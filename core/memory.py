@@ -0,0 +1,226 @@
+import os
+import sys
+import atexit
+import time
+import uuid
+import pickle
+import shutil
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Items smaller than this are never worth evicting before the big ones
+MIN_EVICT_BYTES = 64 * 1024
+
+
+def estimate_size(obj, _seen=None):
+    """Approximate deep size in bytes of the objects the app keeps per session."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # getsizeof already includes the buffer of an array that owns its data, but not of a view
+        return max(sys.getsizeof(obj), obj.nbytes)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+
+class _Entry:
+    def __init__(self, value, size, recompute):
+        self.value = value
+        self.size = size
+        self.recompute = recompute
+        self.path = None      # set while offloaded to disk
+        self.dropped = False  # evicted without a copy; only recompute can bring it back
+
+
+class SessionMemory:
+    """
+    Accounts for the large objects each session keeps (extracted texts, results) and
+    enforces one process-wide budget. When over budget, the least recently used large
+    items are dropped if they can be recomputed, otherwise offloaded to disk, and are
+    brought back transparently on the next get(). Sessions that end are released.
+    """
+
+    def __init__(self, budget_bytes, offload_dir=None, sweep_interval=30):
+        self.budget_bytes = budget_bytes
+        # One directory per process, emptied on start and removed at exit, so crashed or
+        # restarted servers never leave their pickles behind for long
+        self.offload_dir = os.path.join(offload_dir or tempfile.gettempdir(), f"ai-detector-offload-{os.getpid()}")
+        shutil.rmtree(self.offload_dir, ignore_errors=True)
+        os.makedirs(self.offload_dir, exist_ok=True)
+        atexit.register(shutil.rmtree, self.offload_dir, True)
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()   # (session_id, name) -> _Entry, LRU order
+        self._resident = 0
+        self._lock = threading.RLock()
+        self._last_sweep = 0.0
+        self._inactive = set()
+        self._evictions = 0
+        self._reloads = 0
+
+    @classmethod
+    def from_env(cls):
+        budget_mb = float(os.getenv("GEMINI_SESSION_MEMORY_MB", "512"))
+        return cls(int(budget_mb * 1024 * 1024), offload_dir=os.getenv("GEMINI_OFFLOAD_DIR") or None)
+
+    def put(self, session_id, name, value, recompute=None):
+        """Stores a value for a session. `recompute()` rebuilds it if it had to be dropped."""
+        entry = _Entry(value, estimate_size(value), recompute)
+        with self._lock:
+            self._discard((session_id, name))
+            self._entries[(session_id, name)] = entry
+            self._resident += entry.size
+            self._enforce_budget()
+        return value
+
+    def get(self, session_id, name, default=None):
+        key = (session_id, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            if entry.path is None and not entry.dropped:
+                return entry.value
+            path = entry.path
+
+        # Disk reads and recomputes run outside the lock, so other sessions are not held up
+        value = self._restore(path, entry.recompute)
+
+        with self._lock:
+            current = self._entries.get(key)
+            if current is entry and entry.path is None and not entry.dropped:
+                # Another thread brought it back meanwhile
+                return entry.value
+            if current is not entry or entry.path != path:
+                # Replaced, released or evicted again meanwhile: start over from the current state
+                return self.get(session_id, name, default)
+            if value is None:
+                self._discard(key)
+                return default
+            if path is not None:
+                _remove_file(path)
+            self._reloads += 1
+            entry.value, entry.path, entry.dropped = value, None, False
+            self._resident += entry.size
+            self._enforce_budget(keep=key)
+            return value
+
+    def release(self, session_id):
+        """Frees everything a session holds, in memory and on disk."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == session_id]:
+                self._discard(key)
+
+    def sweep(self, is_active, other_sessions=()):
+        """
+        Releases sessions for which is_active(session_id) is False (rate limited) and returns their ids,
+        so state held elsewhere can be freed too; `other_sessions` are checked even if nothing is stored here.
+        A session must be seen inactive on two consecutive sweeps, so a brief reconnect keeps its data.
+        """
+        now = time.time()
+        if now - self._last_sweep < self.sweep_interval:
+            return set()
+        self._last_sweep = now
+        with self._lock:
+            sessions = {k[0] for k in self._entries} | set(other_sessions)
+        inactive = {session_id for session_id in sessions if not is_active(session_id)}
+        released = inactive & self._inactive
+        for session_id in released:
+            logging.info(f"Releasing memory of ended session {session_id[:8]}.")
+            self.release(session_id)
+        self._inactive = inactive - self._inactive
+        return released
+
+    def metrics(self):
+        """Resident/offloaded bytes per session and in total."""
+        with self._lock:
+            sessions = {}
+            offloaded = 0
+            for (session_id, _), entry in self._entries.items():
+                stats = sessions.setdefault(session_id, {"resident_bytes": 0, "offloaded_bytes": 0, "items": 0})
+                stats["items"] += 1
+                if entry.path is None and not entry.dropped:
+                    stats["resident_bytes"] += entry.size
+                elif entry.path is not None:
+                    stats["offloaded_bytes"] += entry.size
+                    offloaded += entry.size
+            return {
+                "budget_bytes": self.budget_bytes,
+                "resident_bytes": self._resident,
+                "offloaded_bytes": offloaded,
+                "sessions": len(sessions),
+                "evictions": self._evictions,
+                "reloads": self._reloads,
+                "per_session": sessions,
+            }
+
+    def _enforce_budget(self, keep=None):
+        # Caller holds the lock. Large LRU items go first, then anything but `keep`.
+        if self._resident <= self.budget_bytes:
+            return
+        for min_size in (MIN_EVICT_BYTES, 0):
+            for key, entry in list(self._entries.items()):
+                if self._resident <= self.budget_bytes:
+                    return
+                if key == keep or entry.path is not None or entry.dropped or entry.size < min_size:
+                    continue
+                self._evict(key, entry)
+
+    def _evict(self, key, entry):
+        if entry.recompute is not None:
+            entry.dropped = True
+        else:
+            path = os.path.join(self.offload_dir, f"{uuid.uuid4().hex}.pkl")
+            try:
+                with open(path, "wb") as f:
+                    pickle.dump(entry.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                logging.warning(f"Could not offload {key[1]} to disk, dropping it: {e}")
+                entry.dropped = True
+            else:
+                entry.path = path
+        entry.value = None
+        self._resident -= entry.size
+        self._evictions += 1
+
+    def _restore(self, path, recompute):
+        # Runs without the lock; the file is removed by get() once the value is back in place
+        if path is not None:
+            try:
+                with open(path, "rb") as f:
+                    return pickle.load(f)
+            except Exception as e:
+                logging.warning(f"Could not reload offloaded item: {e}")
+        if recompute is not None:
+            return recompute()
+        return None
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry.path is not None:
+            _remove_file(entry.path)
+        elif not entry.dropped:
+            self._resident -= entry.size
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+session_memory = SessionMemory.from_env()
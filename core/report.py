@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import google.generativeai as genai
+
+# Structured output contract for an analysis.
+# Gemini emits schema properties in alphabetical order unless the SDK supports an
+# explicit ordering, so the key names are chosen to sort score and verdict first.
+REPORT_FIELDS = ["ai_score", "ai_verdict", "key_observations", "reasoning"]
+
+REPORT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "ai_score": {
+            "type": "INTEGER",
+            "description": "Probability (0-100) that the text is AI-generated.",
+        },
+        "ai_verdict": {
+            "type": "STRING",
+            "description": "Human-written / AI-generated / Mixed.",
+        },
+        "key_observations": {
+            "type": "ARRAY",
+            "items": {"type": "STRING"},
+            "description": "Specific linguistic features, perplexity cues or structural patterns.",
+        },
+        "reasoning": {
+            "type": "STRING",
+            "description": "Detailed explanation of why the score was assigned.",
+        },
+    },
+    "required": REPORT_FIELDS,
+}
+
+# Score-only tier: just the first two fields of the full report
+SCORE_FIELDS = REPORT_FIELDS[:2]
+SCORE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {k: REPORT_SCHEMA["properties"][k] for k in SCORE_FIELDS},
+    "required": SCORE_FIELDS,
+}
+
+# Per-segment attribution: overall score/verdict first, then one score per numbered segment
+SEGMENT_FIELDS = SCORE_FIELDS + ["segment_scores"]
+SEGMENT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": dict(
+        SCORE_SCHEMA["properties"],
+        segment_scores={
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "id": {"type": "INTEGER"},
+                    "score": {"type": "INTEGER"},
+                },
+                "required": ["id", "score"],
+            },
+            "description": "AI probability (0-100) for every numbered segment.",
+        },
+    ),
+    "required": SEGMENT_FIELDS,
+}
+
+if "property_ordering" in genai.protos.Schema.meta.fields:
+    REPORT_SCHEMA["property_ordering"] = REPORT_FIELDS
+    SCORE_SCHEMA["property_ordering"] = SCORE_FIELDS
+    SEGMENT_SCHEMA["property_ordering"] = SEGMENT_FIELDS
+
+# Analysis tiers. Output tokens dominate latency and cost, so each tier gets its own budget.
+# 2.5 models spend part of max_output_tokens on thinking (not configurable in this SDK),
+# which is why even the score-only tier keeps some headroom.
+DEPTH_SCORE = "score"
+DEPTH_SINGLE = "single"
+DEPTH_FULL = "full"
+DEPTH_SEGMENTS = "segments"
+
+# deadline_seconds is the default overall budget, sized for the tier's longest answer.
+ANALYSIS_DEPTHS = {
+    DEPTH_SCORE: {"schema": SCORE_SCHEMA, "max_output_tokens": 1024, "deadline_seconds": 45},
+    DEPTH_SINGLE: {"schema": REPORT_SCHEMA, "max_output_tokens": 4096, "deadline_seconds": 90},
+    DEPTH_FULL: {"schema": REPORT_SCHEMA, "max_output_tokens": 8192, "deadline_seconds": 150},
+    # ~15 tokens per segment; segments.MAX_SEGMENTS keeps the count within this
+    DEPTH_SEGMENTS: {"schema": SEGMENT_SCHEMA, "max_output_tokens": 8192, "deadline_seconds": 120},
+}
+
+def deadline_seconds(depth):
+    """Overall budget for one analysis of a tier; GEMINI_DEADLINE_SECONDS overrides every tier."""
+    return float(os.getenv("GEMINI_DEADLINE_SECONDS") or ANALYSIS_DEPTHS[depth]["deadline_seconds"])
+
+
+LANGUAGES = {
+    "en": "English",
+    "zh-TW": "Traditional Chinese (繁體中文)",
+}
+
+
+def depth_instruction(depth, language="en"):
+    """Output instructions for a tier, appended after the content to analyze."""
+    if depth not in ANALYSIS_DEPTHS:
+        raise ValueError(f"Unknown analysis depth: {depth}")
+
+    if depth == DEPTH_SCORE:
+        return (
+            "Respond with a JSON object containing only `ai_score` (integer 0-100, the probability "
+            "of AI generation) and `ai_verdict` (Human-written / AI-generated / Mixed). No explanation."
+        )
+
+    if depth == DEPTH_SEGMENTS:
+        return (
+            "The content is split into segments, each prefixed with its number like `[3]`. "
+            "Respond with a JSON object containing `ai_score` (integer 0-100 for the whole text), "
+            "`ai_verdict` (Human-written / AI-generated / Mixed) and `segment_scores`: one "
+            "`{\"id\": n, \"score\": 0-100}` entry for EVERY segment, in order. No explanation."
+        )
+
+    if depth == DEPTH_SINGLE:
+        language_rule = f"All prose MUST be written in {LANGUAGES.get(language, language)} only."
+    else:
+        language_rule = "All prose MUST be provided in BOTH **Traditional Chinese (繁體中文)** and **English**."
+
+    return f"""Respond with a single JSON object, fields in exactly this order:
+1. `ai_score`: integer 0-100, the probability of AI generation.
+2. `ai_verdict`: a clear statement (Human-written / AI-generated / Mixed).
+3. `key_observations`: bullet points highlighting specific linguistic features, perplexity cues, or structural patterns.
+4. `reasoning`: in-depth explanation of why you assigned the score.
+{language_rule}"""
+
+# Legacy free-text format, still accepted so older cached or fallback responses parse
+LEGACY_SCORE_PATTERN = re.compile(r"<<SCORE:(\d+)>>")
+
+_SCORE_PATTERN = re.compile(r'"ai_score"\s*:\s*(-?\d+)')
+_NUMBER_END = re.compile(r'"ai_score"\s*:\s*-?\d+\s*[,}]')
+
+
+def clamp_score(value):
+    return max(0, min(100, int(value)))
+
+
+def parse_report(text):
+    """
+    Parses a complete response into a report dict:
+    {"score", "verdict", "observations", "reasoning", "segment_scores", "structured"}.
+    `score` is None when the model did not provide one.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        data = None
+
+    if isinstance(data, dict):
+        score = data.get("ai_score")
+        return {
+            "score": clamp_score(score) if isinstance(score, (int, float)) else None,
+            "verdict": data.get("ai_verdict") or "",
+            "observations": [str(o) for o in data.get("key_observations") or []],
+            "reasoning": data.get("reasoning") or "",
+            "segment_scores": data.get("segment_scores") or [],
+            "structured": True,
+        }
+
+    # Not JSON: legacy tag format or a plain system message
+    text = text or ""
+    match = LEGACY_SCORE_PATTERN.search(text)
+    return {
+        "score": clamp_score(match.group(1)) if match else None,
+        "verdict": "",
+        "observations": [],
+        "reasoning": LEGACY_SCORE_PATTERN.sub("", text).strip(),
+        "segment_scores": [],
+        "structured": False,
+    }
+
+
+class SystemMessage(str):
+    """
+    A status message (e.g. timed out) ending a stream after part of the answer already went out.
+    It replaces that partial output instead of being appended to it.
+    """
+
+
+def join_stream(chunks):
+    """The response text of a stream of chunks, honoring SystemMessage."""
+    parts = []
+    for chunk in chunks:
+        if isinstance(chunk, SystemMessage):
+            parts = []
+        parts.append(chunk)
+    return "".join(parts)
+
+
+def render_markdown(report):
+    """Markdown body for a parsed report (everything except the gauge)."""
+    if not report["structured"]:
+        return report["reasoning"]
+
+    lines = []
+    if report["verdict"]:
+        lines.append(f"**Verdict / 判斷**: {report['verdict']}")
+    if report["observations"]:
+        lines.append("**Key Observations / 關鍵觀察**")
+        lines.append("\n".join(f"- {o}" for o in report["observations"]))
+    if report["reasoning"]:
+        lines.append("**Detailed Analysis / 詳細分析**")
+        lines.append(report["reasoning"])
+    return "\n\n".join(lines)
+
+
+class ReportStreamParser:
+    """
+    Incrementally parses a streamed JSON report.
+    The score and verdict become available as soon as their chunks arrive,
+    long before the explanation has finished streaming.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.score = None
+        self.verdict = None
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        if self.score is None and _NUMBER_END.search(self.buffer):
+            # Only trust the number once it is terminated, "7" may still become "72"
+            self.score = clamp_score(_SCORE_PATTERN.search(self.buffer).group(1))
+        if self.verdict is None:
+            verdict, complete = partial_string(self.buffer, "ai_verdict")
+            if complete:
+                self.verdict = verdict
+
+    def partial_reasoning(self):
+        """Reasoning text received so far (may be cut mid-sentence)."""
+        return partial_string(self.buffer, "reasoning")[0] or ""
+
+    def looks_structured(self):
+        return self.buffer.lstrip()[:1] in ("", "{")
+
+
+def partial_string(buffer, field):
+    """
+    Extracts the (possibly unterminated) string value of `field` from partial JSON.
+    Returns (value or None, complete).
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(field), buffer)
+    if not match:
+        return None, False
+
+    body = buffer[match.end():]
+    end = None
+    i = 0
+    while i < len(body):
+        if body[i] == "\\":
+            i += 2
+            continue
+        if body[i] == '"':
+            end = i
+            break
+        i += 1
+
+    raw = body if end is None else body[:end]
+    if end is None:
+        # Drop a trailing escape sequence that has not fully arrived yet
+        if i > len(body):
+            raw = raw[:-1]
+        raw = re.sub(r'\\u[0-9a-fA-F]{0,3}$', "", raw)
+    try:
+        return json.loads(f'"{raw}"'), end is not None
+    except ValueError:
+        return raw, end is not None
@@ -0,0 +1,168 @@
+import os
+import re
+import time
+import random
+import logging
+import threading
+from google.api_core import exceptions
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the overall request deadline leaves no room for another attempt."""
+
+
+class TooSlowForDeadline(Exception):
+    """Raised when a model is expected to take longer than the time left; a faster one may still fit."""
+
+
+class Deadline:
+    """
+    One overall time budget shared by every attempt, backoff and fallback of a request.
+    Cancelling it ends the budget at once and wakes any backoff sleeping on it.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def remaining(self):
+        if self._cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, seconds):
+        """True if something taking `seconds` can still finish in time."""
+        return self.remaining() >= seconds
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def sleep(self, seconds):
+        """Waits up to `seconds`, returning early (True) if the deadline is cancelled."""
+        return self._cancelled.wait(seconds)
+
+
+RETRYABLE_ERRORS = (
+    exceptions.ResourceExhausted,     # 429
+    exceptions.ServiceUnavailable,    # 503
+    exceptions.InternalServerError,   # 500
+    exceptions.DeadlineExceeded,      # 504
+)
+
+_HINT_PATTERN = re.compile(r"retry(?:[ _]?delay|[ -]after| in)\D{0,20}?(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def is_retryable(error):
+    # Some SDK paths wrap the 429 in a generic exception
+    return isinstance(error, RETRYABLE_ERRORS) or "429" in str(error)
+
+
+def error_code(error):
+    """HTTP status for API errors, otherwise the exception type name (for logs and traces)."""
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else type(error).__name__
+
+
+def is_quota_error(error):
+    return isinstance(error, exceptions.ResourceExhausted) or "429" in str(error)
+
+
+def retry_delay_hint(error):
+    """
+    Seconds the server asked us to wait, or None.
+    Looks at RetryInfo details (gRPC and REST forms), a Retry-After header and the message text.
+    """
+    for detail in getattr(error, "details", None) or ():
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None and (delay.seconds or delay.nanos):
+            return delay.seconds + delay.nanos / 1e9
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            try:
+                return float(str(detail["retryDelay"]).rstrip("s"))
+            except ValueError:
+                pass
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+
+    match = _HINT_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+class RetryPolicy:
+    """
+    Retries transient errors with jittered exponential backoff, honoring server
+    retry hints, without ever sleeping or starting a call past the deadline.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=20.0, min_call_seconds=2.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Shortest time a call needs to be worth starting
+        self.min_call_seconds = min_call_seconds
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_attempts=int(os.getenv("GEMINI_MAX_ATTEMPTS", "3")),
+            min_call_seconds=float(os.getenv("GEMINI_MIN_CALL_SECONDS", "2")),
+        )
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for the given (0-based) attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, deadline, label="request", expected_seconds=None, sleep=None, on_error=None, retry_now=None):
+        """
+        Calls fn(timeout) until it succeeds, a non-retryable error occurs, attempts run
+        out, or the deadline cannot accommodate another attempt. `timeout` is the time
+        left on the deadline, to be passed to the underlying RPC.
+        Raises DeadlineExceeded when no call fits any more (or the deadline is cancelled), and
+        TooSlowForDeadline when only this call's `expected_seconds` doesn't fit.
+        `on_error` is called with every failed attempt's exception.
+        Backoffs wait on the deadline (unless `sleep` is given), so cancelling it ends them early.
+        `retry_now(error)` returning True skips the backoff (e.g. another API key can take the retry).
+        """
+        needed = max(self.min_call_seconds, expected_seconds or 0)
+        for attempt in range(self.max_attempts):
+            if deadline.cancelled:
+                raise DeadlineExceeded(f"{label}: cancelled.")
+            if not deadline.allows(self.min_call_seconds):
+                raise DeadlineExceeded(f"{label}: {deadline.remaining():.1f}s left, no call fits.")
+            if not deadline.allows(needed):
+                raise TooSlowForDeadline(f"{label}: {deadline.remaining():.1f}s left, a call needs ~{needed:.1f}s.")
+            try:
+                return fn(deadline.remaining())
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+
+                hint = retry_delay_hint(e)
+                delay = hint if hint is not None else self.backoff(attempt)
+                if retry_now is not None and retry_now(e):
+                    delay = 0.0
+                if not deadline.allows(delay + needed):
+                    # Waiting would blow the budget; let the caller move on to another model
+                    logging.warning(f"{label}: retry in {delay:.1f}s would exceed the deadline, giving up ({e}).")
+                    raise
+                logging.warning(f"{label}: attempt {attempt+1}/{self.max_attempts} failed ({type(e).__name__}). Retrying in {delay:.1f}s...")
+                (sleep or deadline.sleep)(delay)
+
+        raise DeadlineExceeded(f"{label}: no attempts configured.")
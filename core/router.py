@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import threading
+import logging
+
+# Known models. `cost` is a relative rank (cheaper/faster first); `latency` is the prior
+# guess in seconds for a score-only answer, used until real measurements exist.
+MODEL_CATALOG = {
+    "gemini-2.5-flash-lite": {"context_tokens": 1_048_576, "cost": 0, "latency": 1.5},
+    "gemini-2.5-flash": {"context_tokens": 1_048_576, "cost": 1, "latency": 3.0},
+    "gemini-2.0-flash-exp": {"context_tokens": 1_048_576, "cost": 1, "latency": 3.0},
+    "gemini-1.5-pro": {"context_tokens": 2_097_152, "cost": 3, "latency": 8.0},
+    "gemini-pro": {"context_tokens": 32_760, "cost": 2, "latency": 5.0},
+}
+
+# Inputs up to this size are "small": cheap models are strongly preferred
+SMALL_INPUT_TOKENS = 8_000
+# Seconds of expected latency one cost rank is worth when ranking models
+COST_WEIGHT_SECONDS = 2.0
+# How strongly a model's recent error rate pushes it down the order
+ERROR_PENALTY = 4.0
+# Weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.3
+# Consecutive failures after which a model sits out for COOLDOWN_SECONDS
+COOLDOWN_FAILURES = 3
+COOLDOWN_SECONDS = 60
+
+
+class _ModelStats:
+    def __init__(self):
+        self.latency = {}         # depth -> EWMA seconds
+        self.samples = {}         # depth -> count
+        self.error_rate = 0.0     # EWMA of failures (0..1)
+        self.consecutive_failures = 0
+        self.last_failure = 0.0
+
+
+class ModelRouter:
+    """
+    Picks the model order per request from the input size, analysis depth,
+    each model's context limit and its recently observed latency and error rate.
+    Every decision is logged (and optionally appended to GEMINI_ROUTING_LOG as JSON lines).
+    """
+
+    def __init__(self, models, catalog=None, log_path=None):
+        self.models = list(models)
+        self.catalog = catalog or MODEL_CATALOG
+        self.log_path = log_path
+        self._stats = {m: _ModelStats() for m in self.models}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, models):
+        return cls(models, log_path=os.getenv("GEMINI_ROUTING_LOG"))
+
+    def route(self, input_tokens, depth, max_output_tokens=0):
+        """Returns the models to try, best first. Models whose context is too small are left out."""
+        needed = input_tokens + max_output_tokens
+        candidates = []
+        now = time.time()
+        with self._lock:
+            for index, model in enumerate(self.models):
+                info = self.catalog.get(model, {})
+                if needed > info.get("context_tokens", float("inf")):
+                    continue
+                stats = self._stats[model]
+                cooling = (stats.consecutive_failures >= COOLDOWN_FAILURES
+                           and now - stats.last_failure < COOLDOWN_SECONDS)
+                cost = info.get("cost", 1)
+                if input_tokens <= SMALL_INPUT_TOKENS:
+                    # Small inputs finish quickly anywhere, so price dominates
+                    cost *= 2
+                score = (self._expected_latency(model, depth) * (1 + ERROR_PENALTY * stats.error_rate)
+                         + cost * COST_WEIGHT_SECONDS)
+                # Ties keep the configured order
+                candidates.append((cooling, score, index, model))
+
+        candidates.sort()
+        order = [model for _, _, _, model in candidates]
+        self._log_decision({
+            "ts": round(now, 3),
+            "input_tokens": input_tokens,
+            "depth": depth,
+            "order": order,
+            "scores": {model: round(score, 2) for _, score, _, model in candidates},
+            "cooling": [model for cooling, _, _, model in candidates if cooling],
+        })
+        return order
+
+    def expected_latency(self, model, depth):
+        """Measured latency estimate, or None until there are enough samples to trust."""
+        with self._lock:
+            stats = self._stats.get(model)
+            if not stats or stats.samples.get(depth, 0) < 3:
+                return None
+            return stats.latency[depth]
+
+    def record_success(self, model, depth, seconds):
+        with self._lock:
+            stats = self._stats.setdefault(model, _ModelStats())
+            previous = stats.latency.get(depth)
+            stats.latency[depth] = seconds if previous is None else previous + EWMA_ALPHA * (seconds - previous)
+            stats.samples[depth] = stats.samples.get(depth, 0) + 1
+            stats.error_rate *= 1 - EWMA_ALPHA
+            stats.consecutive_failures = 0
+
+    def record_failure(self, model):
+        with self._lock:
+            stats = self._stats.setdefault(model, _ModelStats())
+            stats.error_rate += EWMA_ALPHA * (1 - stats.error_rate)
+            stats.consecutive_failures += 1
+            stats.last_failure = time.time()
+
+    def metrics(self):
+        """Per-model latency/error snapshot."""
+        with self._lock:
+            return {
+                model: {
+                    "latency_s": {d: round(v, 2) for d, v in s.latency.items()},
+                    "samples": dict(s.samples),
+                    "error_rate": round(s.error_rate, 3),
+                    "consecutive_failures": s.consecutive_failures,
+                }
+                for model, s in self._stats.items()
+            }
+
+    def _expected_latency(self, model, depth):
+        # Caller holds the lock
+        stats = self._stats[model]
+        if depth in stats.latency:
+            return stats.latency[depth]
+        return self.catalog.get(model, {}).get("latency", 5.0)
+
+    def _log_decision(self, decision):
+        line = json.dumps(decision, ensure_ascii=False)
+        logging.info(f"Routing decision: {line}")
+        if self.log_path:
+            try:
+                with self._log_lock, open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logging.warning(f"Could not write routing log {self.log_path}: {e}")
@@ -0,0 +1,171 @@
+import io
+import os
+import numpy as np
+from core import segments
+from core.incremental import verdict_for
+from core.report import DEPTH_SEGMENTS, parse_report
+
+# PDFs with at least this many pages are sampled instead of read in full
+SAMPLE_MIN_PAGES = int(os.getenv("GEMINI_SAMPLE_MIN_PAGES", "30"))
+# Stop once the 95% interval of the document score is this narrow (± points)
+SAMPLE_HALF_WIDTH = float(os.getenv("GEMINI_SAMPLE_HALF_WIDTH", "7.5"))
+SAMPLE_SEED = 0
+# Sampling runs several requests back to back, so its overall deadline is longer than one analysis
+SAMPLE_DEADLINE_SECONDS = float(os.getenv("GEMINI_SAMPLE_DEADLINE_SECONDS", "180"))
+PAGES_PER_REQUEST = 8
+MIN_SAMPLED_PAGES = 8
+MAX_SAMPLED_PAGES = 64
+# Long pages are cut so one request stays well inside the score tier's budget
+PAGE_CHARS = 4000
+Z_95 = 1.96
+
+
+class PdfPages:
+    """Lazy view of a PDF: the page count is read up front, page text only when asked for."""
+
+    def __init__(self, data):
+        import PyPDF2
+        self._reader = PyPDF2.PdfReader(io.BytesIO(data))
+
+    @property
+    def count(self):
+        return len(self._reader.pages)
+
+    def text(self, index):
+        return self._reader.pages[index].extract_text() or ""
+
+
+def stratified_order(count, strata, seed=SAMPLE_SEED):
+    """
+    Page indices in sampling order. The document is cut into `strata` equal runs of pages
+    and each round takes one random, not yet used page from every run, so any prefix of
+    the order is spread over the whole document. The same seed gives the same order.
+    """
+    rng = np.random.default_rng(seed)
+    runs = [rng.permutation(run) for run in np.array_split(np.arange(count), min(count, strata))]
+    rounds = max(len(run) for run in runs)
+    return np.array([run[r] for r in range(rounds) for run in runs if r < len(run)], dtype=np.int64)
+
+
+class PageSampler:
+    """Tracks sampled page scores and decides when the document-level estimate is tight enough."""
+
+    def __init__(self, count, seed=SAMPLE_SEED, batch_pages=PAGES_PER_REQUEST, min_pages=MIN_SAMPLED_PAGES,
+                 max_pages=MAX_SAMPLED_PAGES, half_width=SAMPLE_HALF_WIDTH):
+        self.count = count
+        self.seed = seed
+        self.batch_pages = batch_pages
+        self.min_pages = min_pages
+        self.max_pages = max_pages
+        self.half_width = half_width
+        self.order = stratified_order(count, batch_pages, seed)
+        self.cursor = 0
+        self.scores = np.full(count, np.nan)
+        self.blank = 0
+
+    def next_batch(self):
+        batch = self.order[self.cursor:self.cursor + self.batch_pages]
+        self.cursor += len(batch)
+        return batch
+
+    def record(self, pages, scores):
+        self.scores[pages] = scores
+
+    @property
+    def scored(self):
+        return np.flatnonzero(~np.isnan(self.scores))
+
+    @property
+    def population(self):
+        """Estimated pages with text: the blank share of the pages read so far, applied to the whole document."""
+        read = self.scored.size + self.blank
+        if not read:
+            return float(self.count)
+        return self.count * (1 - self.blank / read)
+
+    def interval(self):
+        """(mean, 95% half width) over the scored pages, with finite population correction."""
+        values = self.scores[self.scored]
+        n = values.size
+        if n == 0:
+            return None, float("inf")
+        if n < 2:
+            return float(values.mean()), float("inf")
+        population = max(n, self.population)
+        correction = np.sqrt(max(0.0, (population - n) / max(1, population - 1)))
+        return float(values.mean()), float(Z_95 * values.std(ddof=1) / np.sqrt(n) * correction)
+
+    def done(self):
+        n = self.scored.size
+        if self.cursor >= len(self.order) or n >= self.max_pages:
+            return True
+        return n >= self.min_pages and self.interval()[1] <= self.half_width
+
+    def report(self):
+        mean, half = self.interval()
+        n = self.scored.size
+        score = None if mean is None else int(round(mean))
+        coverage = n / self.count if self.count else 0.0
+        observations = [
+            f"Coverage: {n} of {self.count} pages scored ({coverage:.0%}), stratified sample, seed {self.seed}. "
+            f"/ 抽樣涵蓋 {n} / {self.count} 頁。",
+        ]
+        if np.isfinite(half):
+            observations.append(f"95% interval: {score} ± {half:.1f} points. / 95% 信賴區間 ±{half:.1f} 分。")
+        if self.blank:
+            observations.append(f"{self.blank} sampled pages had no extractable text (e.g. scans) and were skipped.")
+        if n:
+            top = self.scored[np.argsort(-self.scores[self.scored])[:3]]
+            observations.append("Highest-scoring pages: " + ", ".join(f"p.{i + 1} ({self.scores[i]:.0f}%)" for i in top))
+        if n + self.blank >= self.count:
+            stopped = "every page was read"
+        elif half <= self.half_width:
+            stopped = "the interval was tight enough"
+        else:
+            stopped = "the sampling limit was reached"
+        return {
+            "score": score,
+            "verdict": verdict_for(score),
+            "observations": observations,
+            "reasoning": f"Document score is the mean of the sampled page scores; sampling stopped because {stopped}.",
+            "segment_scores": [],
+            "structured": score is not None,
+            "coverage": {"pages": self.count, "sampled": int(n), "fraction": coverage, "half_width": half},
+        }
+
+
+def sample_pdf_score(handler, data, file_uris=None, tenant=None, deadline=None, on_progress=None):
+    """
+    Scores a large PDF from a seeded, stratified sample of its pages. Each request scores a
+    batch of pages (one segment per page); sampling stops as soon as the 95% interval of the
+    document score is within SAMPLE_HALF_WIDTH. Only sampled pages are ever extracted.
+    `on_progress(message)` is called after every batch.
+    """
+    pages = PdfPages(data)
+    sampler = PageSampler(pages.count)
+    while not sampler.done() and not (deadline and deadline.cancelled):
+        batch = sampler.next_batch()
+        texts = [pages.text(i).strip()[:PAGE_CHARS] for i in batch.tolist()]
+        keep = np.array([bool(t) for t in texts], dtype=bool)
+        sampler.blank += int((~keep).sum())
+        if not keep.any():
+            continue
+        texts = [t for t in texts if t]
+        prompt = "Each numbered segment is one page of a longer document.\n" + "\n".join(
+            f"[{i}] {t}" for i, t in enumerate(texts, 1)
+        )
+        response = parse_report(handler.generate_response(
+            prompt, file_uris=file_uris, tenant=tenant, depth=DEPTH_SEGMENTS, deadline=deadline
+        ))
+        if not response["structured"]:
+            if not sampler.scored.size:
+                # System message (busy / timeout / unavailable): nothing to estimate from
+                return response
+            break
+        sampler.record(batch[keep], segments.align_scores(len(texts), response["segment_scores"]))
+        if on_progress and sampler.scored.size:
+            mean, half = sampler.interval()
+            spread = f" ± {half:.1f}" if np.isfinite(half) else ""
+            on_progress(f"Scored {sampler.scored.size} sampled pages of {sampler.count}, "
+                        f"estimate {mean:.0f}{spread}... / 已抽樣評分 {sampler.scored.size} 頁...")
+    return sampler.report()
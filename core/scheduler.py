@@ -0,0 +1,185 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+# How often a queued request checks whether it was cancelled
+CANCEL_POLL_SECONDS = 0.25
+
+
+class QueueFullError(Exception):
+    """Raised when a request is rejected instead of queued."""
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class _Ticket:
+    def __init__(self, priority, tenant):
+        self.priority = priority
+        self.tenant = tenant
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class RequestScheduler:
+    """
+    Admission control in front of the Gemini handler.
+    - Bounded number of concurrent upstream calls.
+    - Interactive requests are always dispatched before bulk ones, and bulk work
+      can never occupy every slot, so interactive traffic keeps some headroom.
+    - Within a priority class, tenants (sessions) are served round-robin.
+    - Queues are bounded; a full queue rejects immediately with QueueFullError.
+    """
+
+    def __init__(self, max_concurrency=4, max_queue_depth=32, bulk_max_concurrency=None, max_wait=60):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_depth = max_queue_depth
+        if bulk_max_concurrency is None:
+            bulk_max_concurrency = self.max_concurrency - 1
+        self.bulk_max_concurrency = max(1, min(bulk_max_concurrency, self.max_concurrency))
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._running = {p: 0 for p in PRIORITIES}
+        # priority -> OrderedDict(tenant -> deque of tickets); dict order is the round-robin order
+        self._queues = {p: OrderedDict() for p in PRIORITIES}
+        self._waits = {p: deque(maxlen=1000) for p in PRIORITIES}
+        self._rejected = {p: 0 for p in PRIORITIES}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+            max_queue_depth=int(os.getenv("GEMINI_MAX_QUEUE_DEPTH", "32")),
+            max_wait=float(os.getenv("GEMINI_MAX_QUEUE_WAIT", "60")),
+        )
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE, tenant=None, timeout=None, cancelled=None):
+        """
+        Blocks until the caller may run an upstream call, then holds the slot.
+        `timeout` caps the queue wait below max_wait (e.g. the request's remaining deadline).
+        `cancelled()` is polled while queued; once it returns True the request leaves the queue.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        self._acquire(priority, tenant or "anonymous", timeout, cancelled)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def metrics(self):
+        """Snapshot of queue depths, running counts and queue-time percentiles (ms)."""
+        with self._cond:
+            snapshot = {}
+            for p in PRIORITIES:
+                waits = list(self._waits[p])
+                snapshot[p] = {
+                    "running": self._running[p],
+                    "queued": self._depth(p),
+                    "rejected": self._rejected[p],
+                    "wait_p50_ms": _ms(percentile(waits, 50)),
+                    "wait_p95_ms": _ms(percentile(waits, 95)),
+                }
+            return snapshot
+
+    def is_idle(self):
+        """True when nothing is queued and at least one slot is free."""
+        with self._cond:
+            return self._total_running() < self.max_concurrency and not any(self._depth(p) for p in PRIORITIES)
+
+    def _acquire(self, priority, tenant, timeout=None, cancelled=None):
+        with self._cond:
+            if self._depth(priority) >= self.max_queue_depth:
+                self._rejected[priority] += 1
+                raise QueueFullError(f"{priority} queue is full ({self.max_queue_depth} waiting).")
+
+            ticket = _Ticket(priority, tenant)
+            self._queues[priority].setdefault(tenant, deque()).append(ticket)
+            self._dispatch()
+
+            max_wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+            deadline = ticket.enqueued_at + max_wait
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self._rejected[priority] += 1
+                    raise QueueFullError(f"Waited more than {max_wait:.0f}s for a free {priority} slot.")
+                if cancelled is not None and cancelled():
+                    self._remove(ticket)
+                    raise QueueFullError("Request was cancelled while queued.")
+                self._cond.wait(remaining if cancelled is None else min(remaining, CANCEL_POLL_SECONDS))
+
+            wait = time.monotonic() - ticket.enqueued_at
+            self._waits[priority].append(wait)
+            if wait > 1:
+                logging.info(f"Scheduler: {priority} request for {tenant} queued {wait:.2f}s.")
+
+    def _release(self, priority):
+        with self._cond:
+            self._running[priority] -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        # Caller holds the lock
+        granted = False
+        for priority in PRIORITIES:
+            while self._total_running() < self.max_concurrency and self._has_capacity(priority):
+                ticket = self._next_ticket(priority)
+                if ticket is None:
+                    break
+                ticket.granted = True
+                self._running[priority] += 1
+                granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _has_capacity(self, priority):
+        if priority == BULK:
+            return self._running[BULK] < self.bulk_max_concurrency
+        return True
+
+    def _next_ticket(self, priority):
+        queue = self._queues[priority]
+        if not queue:
+            return None
+        tenant, tickets = next(iter(queue.items()))
+        ticket = tickets.popleft()
+        if tickets:
+            queue.move_to_end(tenant)
+        else:
+            del queue[tenant]
+        return ticket
+
+    def _remove(self, ticket):
+        tickets = self._queues[ticket.priority].get(ticket.tenant)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._queues[ticket.priority][ticket.tenant]
+
+    def _depth(self, priority):
+        return sum(len(t) for t in self._queues[priority].values())
+
+    def _total_running(self):
+        return sum(self._running.values())
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
@@ -0,0 +1,96 @@
+import re
+import html
+import numpy as np
+
+SENTENCE = "sentence"
+PARAGRAPH = "paragraph"
+
+# Sentence ends: Western punctuation followed by whitespace, or CJK full stops (no space needed)
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|(?<=[。！？；])\s*|\n\s*\n")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# Output budget is roughly proportional to the segment count, so very long inputs are merged
+MAX_SEGMENTS = 300
+
+
+def segment_text(text, level=SENTENCE, max_segments=MAX_SEGMENTS):
+    """
+    Splits text into (start, end) character spans, one per sentence or paragraph.
+    Whitespace between segments is left out of the spans so it can be re-emitted verbatim.
+    """
+    pattern = _PARAGRAPH_BREAK if level == PARAGRAPH else _SENTENCE_BREAK
+    breaks = np.array([(m.start(), m.end()) for m in pattern.finditer(text)], dtype=np.int64).reshape(-1, 2)
+    starts = np.concatenate(([0], breaks[:, 1]))
+    ends = np.concatenate((breaks[:, 0], [len(text)]))
+
+    # Trim surrounding whitespace and drop empty pieces
+    spans = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            offset = start + len(piece) - len(piece.lstrip())
+            spans.append((offset, offset + len(stripped)))
+    spans = np.array(spans, dtype=np.int64).reshape(-1, 2)
+
+    if len(spans) > max_segments:
+        # Merge runs of consecutive segments so the count stays under the cap
+        groups = np.arange(len(spans)) * max_segments // len(spans)
+        first = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        last = np.r_[first[1:] - 1, len(spans) - 1]
+        spans = np.stack((spans[first, 0], spans[last, 1]), axis=1)
+    return spans
+
+
+def numbered_text(text, spans):
+    """Prompt body with each segment prefixed by its 1-based id, e.g. "[3] ..."."""
+    return "\n".join(f"[{i}] {text[start:end]}" for i, (start, end) in enumerate(spans.tolist(), 1))
+
+
+def align_scores(count, segment_scores):
+    """
+    Maps the model's [{"id", "score"}] list onto segment positions.
+    Returns a float array of length `count`; segments the model skipped are NaN.
+    """
+    scores = np.full(count, np.nan)
+    if not segment_scores:
+        return scores
+    pairs = np.array(
+        [(item.get("id", -1), item.get("score", np.nan)) for item in segment_scores if isinstance(item, dict)],
+        dtype=float,
+    ).reshape(-1, 2)
+    ids = pairs[:, 0]
+    valid = (ids >= 1) & (ids <= count) & (ids == np.round(ids)) & ~np.isnan(pairs[:, 1])
+    scores[ids[valid].astype(int) - 1] = np.clip(pairs[valid, 1], 0, 100)
+    return scores
+
+
+def weighted_score(spans, scores):
+    """Document score as the length-weighted mean of the scored segments (None if none scored)."""
+    lengths = (spans[:, 1] - spans[:, 0]).astype(float)
+    mask = ~np.isnan(scores)
+    if not mask.any() or lengths[mask].sum() == 0:
+        return None
+    return int(round(float(np.average(scores[mask], weights=lengths[mask]))))
+
+
+def render_highlights(text, spans, scores):
+    """HTML for the text with each segment tinted by its AI score (red = likely AI)."""
+    out = []
+    cursor = 0
+    for (start, end), score in zip(spans.tolist(), scores.tolist()):
+        out.append(html.escape(text[cursor:start]).replace("\n", "<br>"))
+        segment = html.escape(text[start:end]).replace("\n", "<br>")
+        if np.isnan(score):
+            out.append(f'<span title="not scored" style="border-bottom: 1px dashed rgba(255,255,255,0.3);">{segment}</span>')
+        else:
+            # Tint strength grows with distance from the undecided middle
+            color = "255,75,75" if score > 50 else "0,204,153"
+            alpha = 0.08 + 0.45 * abs(score - 50) / 50
+            out.append(
+                f'<span title="AI {int(score)}%" style="background: rgba({color},{alpha:.2f}); '
+                f'border-radius: 3px; padding: 0 2px;">{segment}</span>'
+            )
+        cursor = end
+    out.append(html.escape(text[cursor:]).replace("\n", "<br>"))
+    return "".join(out)
@@ -0,0 +1,127 @@
+import threading
+import logging
+
+# How often a caller waiting on a shared stream checks its own cancel/timeout
+FOLLOW_POLL_SECONDS = 0.25
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical streaming calls: callers arriving while a call
+    for the same key is still in flight share its output instead of starting another.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = {}
+
+    def stream(self, key, fn, *args, stop=None, abandon=None, **kwargs):
+        """
+        Shares one run of the generator function fn(*args, **kwargs) per in-flight key,
+        returning True once the shared stream ended. The first caller starts it on a
+        background thread; every caller, the first one included, replays the chunks
+        produced so far and then receives new ones as they arrive. No caller owns the call:
+        - `stop()` is polled while following. When it returns True (this caller's own
+          cancel or timeout) only this caller stops, and the generator returns False.
+        - `abandon()`, given by the caller that starts the call, runs if every caller has
+          stopped following before the call finished, so the upstream work can be cancelled.
+        """
+        with self._lock:
+            shared = self._streams.get(key)
+            starter = shared is None
+            if starter:
+                shared = self._streams[key] = _SharedStream(abandon)
+            shared.followers += 1
+
+        if starter:
+            threading.Thread(
+                target=self._produce, args=(key, shared, fn, args, kwargs), name="singleflight", daemon=True
+            ).start()
+        else:
+            logging.info(f"Coalescing duplicate stream {key[:12]} onto in-flight call.")
+        try:
+            return (yield from shared.follow(stop))
+        finally:
+            self._leave(key, shared)
+
+    def _produce(self, key, shared, fn, args, kwargs):
+        error = None
+        try:
+            chunks = fn(*args, **kwargs)
+            for chunk in chunks:
+                shared.push(chunk)
+                if shared.abandoned:
+                    chunks.close()
+                    break
+        except Exception as e:
+            logging.error(f"Shared stream {key[:12]} failed: {e}")
+            error = e
+        finally:
+            # Drop the key before finishing so late arrivals start a fresh call
+            with self._lock:
+                self._forget_stream(key, shared)
+            shared.finish(error)
+
+    def _leave(self, key, shared):
+        with self._lock:
+            shared.followers -= 1
+            abandoned = shared.followers == 0 and not shared.done
+            if abandoned:
+                # Nobody is listening: late arrivals must not join a call that is being cancelled
+                self._forget_stream(key, shared)
+        if abandoned:
+            shared.abandon()
+
+    def _forget_stream(self, key, shared):
+        # Caller holds the lock
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+
+class _SharedStream:
+    """Chunk buffer written by one producer thread and read by any number of followers."""
+
+    def __init__(self, on_abandon=None):
+        self._cond = threading.Condition()
+        self._chunks = []
+        self._error = None
+        self._on_abandon = on_abandon
+        self.followers = 0
+        self.done = False
+        self.abandoned = False
+
+    def push(self, chunk):
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self._error = error
+            self.done = True
+            self._cond.notify_all()
+
+    def abandon(self):
+        self.abandoned = True
+        if self._on_abandon:
+            self._on_abandon()
+
+    def follow(self, stop=None):
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self._chunks) and not self.done:
+                    if stop and stop():
+                        return False
+                    self._cond.wait(FOLLOW_POLL_SECONDS)
+                pending = self._chunks[index:]
+                index = len(self._chunks)
+                finished = self.done
+                error = self._error
+            yield from pending
+            if finished and index >= len(self._chunks):
+                if error is not None:
+                    raise error
+                return True
+            if stop and stop():
+                return False
@@ -0,0 +1,132 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from core.scheduler import BULK
+from core.report import DEPTH_SCORE, parse_report
+
+# Input must stay unchanged this long before speculative work starts
+SETTLE_SECONDS = float(os.getenv("GEMINI_SPECULATION_SETTLE_SECONDS", "1.5"))
+
+
+class _Speculation:
+    def __init__(self, key):
+        self.key = key
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.state = "waiting"   # waiting -> running -> ready | skipped | failed | cancelled
+
+
+class Speculator:
+    """
+    Pre-computes the score-only analysis while the user is still looking at their input.
+    - Work starts once the input has been unchanged for SETTLE_SECONDS; newer input cancels it.
+    - It only starts when the scheduler is idle and runs at BULK priority, so it never
+      takes quota or slots from requests users have actually made.
+    - A click on the same input reuses the result; if the call is still in flight the
+      click is coalesced onto it by the handler's SingleFlight.
+    Running a score-only pass also creates the context cache for large inputs, which
+    the full report then reuses.
+    """
+
+    def __init__(self, handler, settle_seconds=SETTLE_SECONDS, max_workers=2, max_sessions=500):
+        self.handler = handler
+        self.settle_seconds = settle_seconds
+        self.max_sessions = max_sessions
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculation")
+        self._sessions = OrderedDict()   # session id -> latest _Speculation
+        self._lock = threading.Lock()
+        self._counts = {"started": 0, "reused": 0, "cancelled": 0, "skipped": 0}
+
+    def submit(self, session_id, text, file_uris=None):
+        """Speculates on `text` for a session, cancelling any speculation on older input."""
+        key = _key(text, file_uris)
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current and current.key == key and current.state not in ("skipped", "failed", "cancelled"):
+                return
+            if current:
+                self._cancel(current)
+            speculation = self._sessions[session_id] = _Speculation(key)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._cancel(evicted)
+        self._pool.submit(self._run, speculation, session_id, text, file_uris)
+
+    def take(self, session_id, text, file_uris=None):
+        """Returns the speculated score-only response for this exact input, or None."""
+        with self._lock:
+            speculation = self._sessions.get(session_id)
+        if not speculation or speculation.key != _key(text, file_uris) or speculation.state != "ready":
+            return None
+        with self._lock:
+            self._counts["reused"] += 1
+        return speculation.result
+
+    def cancel(self, session_id):
+        with self._lock:
+            speculation = self._sessions.pop(session_id, None)
+            if speculation:
+                self._cancel(speculation)
+
+    def sweep(self, is_active):
+        """Forgets sessions for which is_active(session_id) is False."""
+        with self._lock:
+            for session_id in [s for s in self._sessions if not is_active(s)]:
+                self._cancel(self._sessions.pop(session_id))
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._counts, sessions=len(self._sessions))
+
+    def _cancel(self, speculation):
+        # Caller holds the lock. A call already sent upstream is left to finish (score-only
+        # responses are short, and other sessions may be coalesced onto it); its result is discarded.
+        if speculation.state == "waiting":
+            speculation.state = "cancelled"
+            self._counts["cancelled"] += 1
+        speculation.cancelled.set()
+
+    def _run(self, speculation, session_id, text, file_uris):
+        if speculation.cancelled.wait(self.settle_seconds):
+            return
+        with self._lock:
+            if speculation.cancelled.is_set():
+                return
+            if not self.handler.scheduler.is_idle():
+                speculation.state = "skipped"
+                self._counts["skipped"] += 1
+                return
+            speculation.state = "running"
+            self._counts["started"] += 1
+
+        started = time.monotonic()
+        try:
+            response = self.handler.generate_response(
+                text, file_uris=file_uris, priority=BULK, tenant=session_id, depth=DEPTH_SCORE
+            )
+        except Exception as e:
+            logging.warning(f"Speculative analysis failed: {e}")
+            speculation.state = "failed"
+            return
+        finally:
+            speculation.done.set()
+
+        # Busy / timeout / error messages are not worth keeping: a real click retries properly
+        if speculation.cancelled.is_set() or not parse_report(response)["structured"]:
+            speculation.state = "failed"
+            return
+        speculation.result = response
+        speculation.state = "ready"
+        logging.info(f"Speculative score ready for {session_id[:8]} in {time.monotonic() - started:.2f}s.")
+
+
+def _key(text, file_uris):
+    # A digest rather than the text itself, so idle sessions don't keep their full input here
+    names = [getattr(f, "name", None) or str(f) for f in file_uris or ()]
+    return hashlib.sha256("\0".join([text, *names]).encode("utf-8")).hexdigest()
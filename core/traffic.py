@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+
+
+class TrafficRecorder:
+    """
+    Captures anonymized request shapes as JSON lines for replay (see replay_traffic.py).
+    No text is stored: only sizes, timing, the chosen model, error codes and a
+    content hash prefix so identical requests stay identical on replay.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Per-process salt, so tenant ids can't be matched across traces
+        self._salt = os.urandom(8).hex()
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("GEMINI_TRAFFIC_LOG")
+        return cls(path) if path else None
+
+    def wrap(self, stream, request, priority, tenant):
+        """Passes the response stream through, recording one event when it ends."""
+        started = time.time()
+        first_chunk_at = None
+        response_chars = 0
+        try:
+            for chunk in stream:
+                if first_chunk_at is None:
+                    first_chunk_at = time.time()
+                response_chars += len(chunk)
+                yield chunk
+        finally:
+            finished = time.time()
+            self.record({
+                "ts": round(started, 3),
+                "shape": request.fingerprint()[:16],
+                "tenant": self._anonymize(tenant),
+                "priority": priority,
+                "depth": request.depth,
+                "input_chars": sum(len(p) for p in request.content_parts if isinstance(p, str)),
+                "input_tokens": request.input_tokens,
+                "files": [int(getattr(p, "size_bytes", 0) or 0) for p in request.content_parts if not isinstance(p, str)],
+                "model": request.model_used,
+                "errors": request.errors,
+                # Requests served by another caller's in-flight call never touch the backend
+                "outcome": request.outcome or "coalesced",
+                "response_chars": response_chars,
+                "ttfb_s": round(first_chunk_at - started, 3) if first_chunk_at else None,
+                "latency_s": round(finished - started, 3),
+                # Time spent in the successful upstream call alone, without queueing or retries
+                "backend_ttfb_s": _round(request.backend_ttfb_s),
+                "backend_s": _round(request.backend_s),
+            })
+
+    def record(self, event):
+        line = json.dumps(event)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logging.warning(f"Could not write traffic log {self.path}: {e}")
+
+    def _anonymize(self, tenant):
+        if not tenant:
+            return None
+        return hashlib.sha256(f"{self._salt}:{tenant}".encode("utf-8")).hexdigest()[:8]
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def load_trace(path):
+    """Reads a recorded trace, oldest event first."""
+    with open(path, encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    return sorted(events, key=lambda e: e["ts"])
@@ -1,3 +1,4 @@
+import io
 import time
 
 def stream_text(text, delay=0.02):
@@ -25,3 +26,12 @@ def generate_skeleton_loader():
         }
     </style>
     """
+
+def extract_text(data, mime_type):
+    """Extracts plain text from uploaded file bytes (PDF, TXT or Markdown)."""
+    if mime_type == "application/pdf":
+        import PyPDF2
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+        return "".join(page.extract_text() or "" for page in pdf_reader.pages)
+    # For TXT and Markdown
+    return data.decode("utf-8")
@@ -0,0 +1,247 @@
+"""
+Replays a recorded traffic trace (captured with GEMINI_TRAFFIC_LOG=trace.jsonl) through
+GeminiHandler against a local stand-in backend, so the request path (scheduler,
+coalescing, routing, retries) can be load-tested without spending API quota.
+
+    python replay_traffic.py trace.jsonl --speed 4 --out before.json
+    # ...change code...
+    python replay_traffic.py trace.jsonl --speed 4 --baseline before.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+
+# Never touch the real API: dummy key, no context caches, no re-recording
+os.environ["GEMINI_API_KEY"] = "replay-stand-in"
+os.environ["GEMINI_CONTEXT_CACHE_MIN_TOKENS"] = str(10 ** 12)
+os.environ.pop("GEMINI_TRAFFIC_LOG", None)
+
+import google.generativeai as genai
+from google.api_core import exceptions
+from core.traffic import load_trace
+from core.scheduler import percentile
+
+MARKER = re.compile(r"\[\[replay:(\w+)\]\]")
+
+ERRORS = {
+    400: exceptions.InvalidArgument,
+    404: exceptions.NotFound,
+    429: exceptions.ResourceExhausted,
+    500: exceptions.InternalServerError,
+    503: exceptions.ServiceUnavailable,
+    504: exceptions.DeadlineExceeded,
+}
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StandInBackend:
+    """
+    Plays back each request shape's recorded upstream behaviour: its error codes
+    first (one per call), then a response of the recorded size and timing.
+    """
+
+    def __init__(self, events, latency_scale=1.0):
+        self.latency_scale = latency_scale
+        self.shapes = {}
+        for event in events:
+            # Coalesced events never reached the backend; keep the one that did
+            if event["outcome"] != "coalesced":
+                self.shapes.setdefault(event["shape"], event)
+        self.pending_errors = {shape: list(e.get("errors") or []) for shape, e in self.shapes.items()}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def respond(self, parts, stream):
+        text = " ".join(p for p in parts if isinstance(p, str))
+        match = MARKER.search(text)
+        shape = match.group(1) if match else None
+        event = self.shapes.get(shape, {})
+        with self._lock:
+            self.calls += 1
+            errors = self.pending_errors.get(shape)
+            code = errors.pop(0) if errors else None
+
+        if code is not None:
+            time.sleep(0.05 * self.latency_scale)
+            raise ERRORS.get(code, exceptions.InternalServerError)(f"replayed error {code}")
+
+        ttfb = (event.get("backend_ttfb_s") or event.get("ttfb_s") or 0.5) * self.latency_scale
+        total = max(ttfb, (event.get("backend_s") or event.get("latency_s") or 1.0) * self.latency_scale)
+        body = _response_body(event.get("response_chars") or 200)
+        chunks = [body[i:i + 200] for i in range(0, len(body), 200)]
+
+        time.sleep(ttfb)
+        if not stream:
+            time.sleep(total - ttfb)
+            return _Chunk(body)
+        return self._trickle(chunks, (total - ttfb) / max(1, len(chunks) - 1))
+
+    def _trickle(self, chunks, gap):
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(gap)
+            yield _Chunk(chunk)
+
+
+def _response_body(size):
+    body = {"ai_score": 50, "ai_verdict": "Mixed", "key_observations": [], "reasoning": ""}
+    padding = max(0, size - len(json.dumps(body)))
+    body["reasoning"] = "x" * padding
+    return json.dumps(body)
+
+
+def install_backend(backend):
+    """Points the SDK entry points GeminiHandler uses at the stand-in backend."""
+
+    class StandInModel:
+        def __init__(self, model_name=None, system_instruction=None, **kwargs):
+            self.model_name = model_name
+
+        def start_chat(self, history=None):
+            return self
+
+        def send_message(self, content, generation_config=None, stream=False, **kwargs):
+            return backend.respond(content, stream)
+
+    genai.GenerativeModel = StandInModel
+    genai.list_models = lambda **kwargs: []
+
+
+def synthetic_prompt(event):
+    """Text of the recorded size; identical shapes get identical text so coalescing still happens."""
+    size = event["input_chars"] + sum(event.get("files") or [])
+    head = f"[[replay:{event['shape']}]] "
+    return head + "lorem " * max(0, (size - len(head)) // 6)
+
+
+def classify(text):
+    if text.startswith("{"):
+        return "ok"
+    if text.startswith("⏱️"):
+        return "timeout"
+    if "Server Busy" in text[:60]:
+        return "busy"
+    return "error"
+
+
+def replay(events, handler, speed=1.0):
+    results = []
+    lock = threading.Lock()
+
+    def run_one(event):
+        started = time.monotonic()
+        first_chunk = None
+        text = ""
+        for chunk in handler.generate_response_stream(
+            synthetic_prompt(event),
+            priority=event.get("priority") or "interactive",
+            tenant=event.get("tenant"),
+            depth=event.get("depth") or "full",
+        ):
+            if first_chunk is None:
+                first_chunk = time.monotonic()
+            text += chunk
+        finished = time.monotonic()
+        with lock:
+            results.append({
+                "latency_s": finished - started,
+                "ttfb_s": (first_chunk or finished) - started,
+                "outcome": classify(text),
+            })
+
+    threads = []
+    t0 = events[0]["ts"]
+    start = time.monotonic()
+    for event in events:
+        delay = (event["ts"] - t0) / speed - (time.monotonic() - start)
+        if delay > 0:
+            time.sleep(delay)
+        thread = threading.Thread(target=run_one, args=(event,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results, time.monotonic() - start
+
+
+def summarize(results, duration, backend_calls):
+    latencies = [r["latency_s"] for r in results]
+    ttfbs = [r["ttfb_s"] for r in results]
+    outcomes = {}
+    for r in results:
+        outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+    return {
+        "requests": len(results),
+        "backend_calls": backend_calls,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(results) / duration, 3) if duration else None,
+        "latency_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in (50, 90, 95, 99)},
+        "ttfb_ms": {f"p{p}": round(percentile(ttfbs, p) * 1000, 1) for p in (50, 90, 95, 99)},
+        "outcomes": outcomes,
+    }
+
+
+def compare(summary, baseline, tolerance):
+    """Prints deltas against a baseline summary; returns True if anything regressed beyond tolerance."""
+    regressed = False
+    checks = [("throughput_rps", summary["throughput_rps"], baseline["throughput_rps"], False)]
+    for group in ("latency_ms", "ttfb_ms"):
+        for p in ("p50", "p95", "p99"):
+            checks.append((f"{group}.{p}", summary[group][p], baseline[group][p], True))
+
+    for name, now, before, lower_is_better in checks:
+        if not before:
+            continue
+        change = (now - before) / before
+        worse = change > tolerance if lower_is_better else change < -tolerance
+        regressed |= worse
+        print(f"{name:18} {before:>10} -> {now:>10}  ({change:+.1%}){'  REGRESSION' if worse else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="JSONL trace recorded via GEMINI_TRAFFIC_LOG")
+    parser.add_argument("--speed", type=float, default=1.0, help="Arrival speed-up factor (1 = real time)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for recorded backend latencies")
+    parser.add_argument("--out", help="Write the summary JSON here")
+    parser.add_argument("--baseline", help="Summary JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression (default 0.10)")
+    args = parser.parse_args()
+
+    events = load_trace(args.trace)
+    if not events:
+        print(f"No events in {args.trace}")
+        return 1
+
+    backend = StandInBackend(events, args.latency_scale)
+    install_backend(backend)
+    from core.api import GeminiHandler
+
+    print(f"Replaying {len(events)} requests at {args.speed}x...")
+    results, duration = replay(events, GeminiHandler(), args.speed)
+    summary = summarize(results, duration, backend.calls)
+    print(json.dumps(summary, indent=2))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(summary, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import json
+import time
+from core import ensemble
+from core.report import SystemMessage
+
+
+def test_consensus_picks_the_tightest_agreeing_group():
+    assert sorted(ensemble.consensus([10, 55, 90, 60], quorum=2, tolerance=10).tolist()) == [1, 3]
+    assert sorted(ensemble.consensus([50, 52, 58, 20], quorum=3, tolerance=10).tolist()) == [0, 1, 2]
+
+
+def test_consensus_needs_quorum_scores_within_tolerance():
+    assert ensemble.consensus([50], quorum=2) is None
+    assert ensemble.consensus([], quorum=2) is None
+    assert ensemble.consensus([10, 40, 80], quorum=2, tolerance=10) is None
+    assert ensemble.consensus([40, 50], quorum=2, tolerance=10) is not None
+
+
+class FakeHandler:
+    """Streams a score-only report per model; `delays` slows a model down."""
+
+    def __init__(self, scores, delays=None, failing=()):
+        self.scores = scores
+        self.delays = delays or {}
+        self.failing = failing
+        self.stopped = []
+
+    def ensemble_models(self, text, file_uris, size):
+        return list(self.scores)[:size]
+
+    def generate_response_stream(self, text, file_uris=None, tenant=None, depth=None, deadline=None, model=None):
+        if model in self.failing:
+            yield json.dumps({"ai_score": 99})[:8]
+            yield SystemMessage("⚠️ timed out")
+            return
+        end = time.monotonic() + self.delays.get(model, 0)
+        while time.monotonic() < end:
+            if deadline.cancelled:
+                self.stopped.append(model)
+                return
+            time.sleep(0.01)
+        yield json.dumps({"ai_score": self.scores[model], "ai_verdict": "Mixed"})
+
+
+def test_agreeing_models_end_the_ensemble_early():
+    handler = FakeHandler({"a": 48, "b": 52, "c": 90}, delays={"c": 5})
+    report = ensemble.ensemble_score(handler, "text", size=3)
+    assert report["score"] == 50
+    assert report["ensemble"]["consensus"] and report["ensemble"]["scores"] == {"a": 48, "b": 52}
+    deadline = time.monotonic() + 2
+    while "c" not in handler.stopped and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert handler.stopped == ["c"]
+
+
+def test_disagreement_averages_everything_and_says_so():
+    report = ensemble.ensemble_score(FakeHandler({"a": 20, "b": 80}), "text", size=2)
+    assert report["score"] == 50 and not report["ensemble"]["consensus"]
+    assert report["ensemble"]["spread"] == 60
+    assert "disagree" in report["reasoning"]
+
+
+def test_a_lone_answer_is_unconfirmed_and_partial_output_is_not_a_score():
+    report = ensemble.ensemble_score(FakeHandler({"a": 70, "b": 0}, failing=("b",)), "text", size=2)
+    assert report["score"] == 70 and report["ensemble"]["spread"] is None
+    assert "not confirmed" in report["reasoning"]
+
+    none = ensemble.ensemble_score(FakeHandler({"a": 0}, failing=("a",)), "text", size=1)
+    assert none["score"] is None and none["ensemble"]["scores"] == {}
@@ -0,0 +1,73 @@
+import numpy as np
+from core.incremental import IncrementalPlan, ParagraphScoreCache, paragraph_key
+
+TEXT = "Alpha para.\n\nBravo para.\n\nCharlie para.\n\nDelta para.\n\nEcho para."
+
+
+def scored(**scores):
+    """Model reply scoring the given 1-based ids, e.g. scored(p1=80)."""
+    return [{"id": int(k[1:]), "score": v} for k, v in scores.items()]
+
+
+def test_fresh_document_needs_every_paragraph():
+    plan = IncrementalPlan(TEXT, cache=ParagraphScoreCache())
+    assert plan.needs_request
+    assert plan.next_batch().tolist() == [0, 1, 2, 3, 4]
+
+
+def test_prompt_keeps_document_ids_and_marks_neighbours_as_context():
+    plan = IncrementalPlan(TEXT, cache=ParagraphScoreCache())
+    lines = plan.prompt(np.array([0, 4])).splitlines()[1:]
+    assert lines == [
+        "[1] Alpha para.",
+        "[context] Bravo para.",
+        "[...]",
+        "[context] Delta para.",
+        "[5] Echo para.",
+    ]
+
+
+def test_merge_accepts_only_asked_paragraphs_and_fills_the_cache():
+    cache = ParagraphScoreCache()
+    plan = IncrementalPlan(TEXT, cache=cache)
+    batch = np.array([0, 1])
+    # The model also scored a context paragraph (3) and skipped 2: neither is taken
+    assert plan.merge(batch, scored(p1=90, p3=10)) == 1
+    assert plan.missing.tolist() == [1, 2, 3, 4]
+    assert plan.merge(np.array([1, 2, 3, 4]), scored(p2=10, p3=10, p4=10, p5=10)) == 4
+    assert not plan.needs_request
+
+    # Whitespace edits and unchanged paragraphs hit the cache; only the rewritten one is sent
+    edited = TEXT.replace("Alpha para.", "Alpha   para.").replace("Charlie para.", "Charlie, rewritten.")
+    again = IncrementalPlan(edited, cache=cache)
+    assert again.next_batch().tolist() == [2]
+    assert again.scores[0] == 90
+
+
+def test_cached_scores_depend_on_the_reference_files():
+    class File:
+        def __init__(self, name):
+            self.name = name
+
+    assert paragraph_key("Same  text") == paragraph_key(" Same text ")
+    assert paragraph_key("Same text", [File("files/a")]) != paragraph_key("Same text")
+    assert paragraph_key("Same text", [File("files/a")]) != paragraph_key("Same text", [File("files/b")])
+
+    cache = ParagraphScoreCache()
+    plan = IncrementalPlan("Only one.", cache=cache)
+    plan.merge(plan.next_batch(), [{"id": 1, "score": 50}])
+    assert not IncrementalPlan("Only one.", cache=cache).needs_request
+    assert IncrementalPlan("Only one.", [File("files/a")], cache=cache).needs_request
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ParagraphScoreCache(capacity=2)
+    cache.put_many(["a", "b"], [1, 2])
+    cache.get_many(["a"])
+    cache.put_many(["c"], [3])
+    np.testing.assert_array_equal(cache.get_many(["a", "b", "c"]), [1, np.nan, 3])
+
+
+def test_sent_fraction_is_by_characters():
+    plan = IncrementalPlan("aaaa\n\nbbbbbbbbbbbb", cache=ParagraphScoreCache())
+    assert plan.sent_fraction(np.array([0])) == 0.25
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from core.memory import SessionMemory, estimate_size
+
+MB = 1024 * 1024
+
+
+def blob(mb, fill=0):
+    return np.full(mb * MB, fill, dtype=np.uint8)
+
+
+def offloaded_files(memory):
+    return os.listdir(memory.offload_dir)
+
+
+def test_estimate_size_counts_nested_arrays_once():
+    array = blob(1)
+    assert estimate_size({"a": array, "b": [array]}) < estimate_size(array) + 1024
+
+
+def test_least_recently_used_item_is_offloaded_and_reloaded(tmp_path):
+    memory = SessionMemory(3 * MB, offload_dir=str(tmp_path))
+    memory.put("s1", "old", blob(2, 1))
+    memory.put("s2", "new", blob(2, 2))
+    stats = memory.metrics()
+    assert stats["resident_bytes"] <= 3 * MB and stats["evictions"] == 1
+    assert stats["per_session"]["s1"]["offloaded_bytes"] > 0
+    assert len(offloaded_files(memory)) == 1
+
+    # Reading it back evicts the other one, and the file goes away
+    assert (memory.get("s1", "old") == 1).all()
+    stats = memory.metrics()
+    assert stats["reloads"] == 1 and stats["per_session"]["s2"]["offloaded_bytes"] > 0
+    assert len(offloaded_files(memory)) == 1
+
+
+def test_recomputable_items_are_dropped_instead_of_written(tmp_path):
+    calls = []
+
+    def rebuild():
+        calls.append(1)
+        return blob(2, 7)
+
+    memory = SessionMemory(3 * MB, offload_dir=str(tmp_path))
+    memory.put("s1", "text", blob(2, 7), recompute=rebuild)
+    memory.put("s1", "other", blob(2))
+    assert offloaded_files(memory) == [] and memory.metrics()["evictions"] == 1
+    assert (memory.get("s1", "text") == 7).all() and calls == [1]
+
+
+def test_small_items_stay_while_large_ones_can_go(tmp_path):
+    memory = SessionMemory(2 * MB, offload_dir=str(tmp_path))
+    memory.put("s1", "small", "x" * 100)
+    memory.put("s1", "large", blob(1))
+    memory.put("s1", "larger", blob(1))
+    stats = memory.metrics()["per_session"]["s1"]
+    assert memory.get("s1", "small") == "x" * 100
+    assert stats["offloaded_bytes"] > 0 and stats["items"] == 3
+
+
+def test_release_frees_memory_and_files(tmp_path):
+    memory = SessionMemory(MB, offload_dir=str(tmp_path))
+    memory.put("s1", "a", blob(1))
+    memory.put("s1", "b", blob(1))
+    memory.release("s1")
+    assert memory.get("s1", "a", "gone") == "gone"
+    assert memory.metrics()["resident_bytes"] == 0 and offloaded_files(memory) == []
+
+
+def test_sweep_releases_sessions_inactive_on_two_sweeps(tmp_path):
+    memory = SessionMemory(10 * MB, offload_dir=str(tmp_path), sweep_interval=0)
+    memory.put("gone", "a", "value")
+    memory.put("back", "a", "value")
+    active = set()
+    assert memory.sweep(active.__contains__, other_sessions={"jobs-only"}) == set()
+    # "back" reconnects before the second sweep and keeps its data
+    active.add("back")
+    assert memory.sweep(active.__contains__, other_sessions={"jobs-only"}) == {"gone", "jobs-only"}
+    assert memory.get("gone", "a") is None and memory.get("back", "a") == "value"
+
+
+def test_sweep_is_rate_limited(tmp_path):
+    memory = SessionMemory(MB, offload_dir=str(tmp_path), sweep_interval=3600)
+    memory.put("s1", "a", "value")
+    memory.sweep(lambda s: False)
+    assert memory.sweep(lambda s: False) == set()
+    assert memory.get("s1", "a") == "value"
+
+
+def test_offload_folder_is_per_process_and_emptied_on_start(tmp_path):
+    memory = SessionMemory(MB, offload_dir=str(tmp_path))
+    assert memory.offload_dir == str(tmp_path / f"ai-detector-offload-{os.getpid()}")
+    open(os.path.join(memory.offload_dir, "stale.pkl"), "wb").close()
+    assert offloaded_files(SessionMemory(MB, offload_dir=str(tmp_path))) == []
@@ -0,0 +1,65 @@
+import json
+from core.report import ReportStreamParser, SystemMessage, join_stream, parse_report, partial_string
+
+REPORT = json.dumps({
+    "ai_score": 72,
+    "ai_verdict": "AI-generated",
+    "key_observations": ["Uniform sentence length"],
+    "reasoning": "Line one.\n\"Quoted\" é and 中文.",
+}, ensure_ascii=True)
+
+
+def test_partial_string_reads_unterminated_values():
+    assert partial_string('{"reasoning": "Half a sent', "reasoning") == ("Half a sent", False)
+    assert partial_string('{"reasoning": "Done", "x"', "reasoning") == ("Done", True)
+    assert partial_string('{"ai_score": 5', "reasoning") == (None, False)
+
+
+def test_partial_string_drops_escapes_that_have_not_fully_arrived():
+    assert partial_string('{"reasoning": "a\\', "reasoning") == ("a", False)
+    assert partial_string('{"reasoning": "a\\u00', "reasoning") == ("a", False)
+    assert partial_string('{"reasoning": "a\\"b\\u00e9', "reasoning") == ('a"bé', False)
+
+
+def test_stream_parser_reports_the_score_once_the_number_ends():
+    parser = ReportStreamParser()
+    for chunk in ['{"ai_sc', 'ore": 7', '2, "ai_verdict": "AI-gen', 'erated", "reasoning": "Line']:
+        parser.feed(chunk)
+        if chunk.endswith("7"):
+            # "7" could still become "72"
+            assert parser.score is None
+    assert parser.score == 72
+    assert parser.verdict == "AI-generated"
+    assert parser.partial_reasoning() == "Line"
+    assert parser.looks_structured()
+
+
+def test_stream_parser_on_every_split_of_a_full_report():
+    for cut in range(len(REPORT) + 1):
+        parser = ReportStreamParser()
+        parser.feed(REPORT[:cut])
+        parser.feed(REPORT[cut:])
+        assert (parser.score, parser.verdict) == (72, "AI-generated")
+        assert parser.partial_reasoning() == json.loads(REPORT)["reasoning"]
+
+
+def test_plain_text_is_not_structured():
+    parser = ReportStreamParser()
+    parser.feed("⚠️ The service is busy")
+    assert not parser.looks_structured() and parser.score is None
+
+
+def test_parse_report_accepts_json_legacy_tags_and_system_messages():
+    report = parse_report(REPORT)
+    assert report["structured"] and report["score"] == 72 and report["observations"] == ["Uniform sentence length"]
+    assert parse_report('{"ai_score": 140}')["score"] == 100
+
+    legacy = parse_report("Looks human. <<SCORE:12>>")
+    assert not legacy["structured"] and legacy["score"] == 12 and legacy["reasoning"] == "Looks human."
+    assert parse_report(None)["score"] is None
+
+
+def test_join_stream_lets_a_system_message_replace_partial_output():
+    assert join_stream(['{"ai_sc', 'ore": 5}']) == '{"ai_score": 5}'
+    assert join_stream(['{"ai_sc', SystemMessage("timed out")]) == "timed out"
+    assert join_stream(["a", SystemMessage("busy"), " later"]) == "busy later"
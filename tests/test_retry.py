@@ -0,0 +1,80 @@
+import time
+import threading
+import pytest
+from google.api_core import exceptions
+from core.retry import Deadline, DeadlineExceeded, TooSlowForDeadline, RetryPolicy, retry_delay_hint
+
+
+def flaky(*errors, result="ok"):
+    """fn(timeout) raising the given errors in turn, then returning `result`."""
+    pending = list(errors)
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if pending:
+            raise pending.pop(0)
+        return result
+    fn.calls = calls
+    return fn
+
+
+def test_transient_errors_are_retried_until_success():
+    policy, delays, seen = RetryPolicy(max_attempts=3), [], []
+    fn = flaky(exceptions.ServiceUnavailable("503"), exceptions.ResourceExhausted("429"))
+    assert policy.call(fn, Deadline(30), sleep=delays.append, on_error=seen.append) == "ok"
+    assert len(fn.calls) == 3
+    assert len(delays) == 2 and [type(e) for e in seen] == [exceptions.ServiceUnavailable, exceptions.ResourceExhausted]
+
+
+def test_non_retryable_errors_and_exhausted_attempts_raise():
+    policy = RetryPolicy(max_attempts=2)
+    with pytest.raises(exceptions.InvalidArgument):
+        policy.call(flaky(exceptions.InvalidArgument("400")), Deadline(30), sleep=lambda s: None)
+    fn = flaky(exceptions.InternalServerError("500"), exceptions.InternalServerError("500"))
+    with pytest.raises(exceptions.InternalServerError):
+        policy.call(fn, Deadline(30), sleep=lambda s: None)
+    assert len(fn.calls) == 2
+
+
+def test_server_retry_hint_is_honored_and_retry_now_skips_it():
+    assert retry_delay_hint(exceptions.ResourceExhausted("Please retry in 7.5s")) == 7.5
+    policy, delays = RetryPolicy(max_attempts=2), []
+    policy.call(flaky(exceptions.ResourceExhausted("Please retry in 7.5s")), Deadline(30), sleep=delays.append)
+    assert delays == [7.5]
+    delays.clear()
+    policy.call(
+        flaky(exceptions.ResourceExhausted("Please retry in 7.5s")), Deadline(30), sleep=delays.append,
+        retry_now=lambda e: True
+    )
+    assert delays == [0.0]
+
+
+def test_backoff_that_would_pass_the_deadline_gives_up():
+    policy = RetryPolicy(max_attempts=3, min_call_seconds=1)
+    fn = flaky(exceptions.ResourceExhausted("Please retry in 60s"))
+    with pytest.raises(exceptions.ResourceExhausted):
+        policy.call(fn, Deadline(5), sleep=lambda s: pytest.fail("slept past the deadline"))
+    assert len(fn.calls) == 1
+
+
+def test_slow_model_is_skippable_but_no_time_at_all_is_not():
+    policy = RetryPolicy(min_call_seconds=2)
+    with pytest.raises(TooSlowForDeadline):
+        policy.call(flaky(), Deadline(5), expected_seconds=10)
+    with pytest.raises(DeadlineExceeded):
+        policy.call(flaky(), Deadline(1), expected_seconds=10)
+    deadline = Deadline(30)
+    deadline.cancel()
+    with pytest.raises(DeadlineExceeded, match="cancelled"):
+        policy.call(flaky(), deadline)
+
+
+def test_cancel_ends_a_backoff_early():
+    policy = RetryPolicy(max_attempts=2, min_call_seconds=0.1)
+    deadline = Deadline(30)
+    threading.Timer(0.1, deadline.cancel).start()
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded, match="cancelled"):
+        policy.call(flaky(exceptions.ResourceExhausted("Please retry in 20s")), deadline)
+    assert time.monotonic() - started < 2
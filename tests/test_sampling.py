@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from core.sampling import PageSampler, Z_95, stratified_order
+
+
+def test_stratified_order_is_a_seeded_permutation_spread_over_the_document():
+    order = stratified_order(100, 8, seed=3)
+    assert sorted(order.tolist()) == list(range(100))
+    np.testing.assert_array_equal(order, stratified_order(100, 8, seed=3))
+    assert not np.array_equal(order, stratified_order(100, 8, seed=4))
+    # The first round takes exactly one page from each of the 8 runs
+    runs = np.array_split(np.arange(100), 8)
+    assert [next(i for i, run in enumerate(runs) if page in run) for page in order[:8]] == list(range(8))
+
+
+def test_interval_needs_two_pages_and_shrinks_with_the_population():
+    sampler = PageSampler(1000)
+    assert sampler.interval() == (None, float("inf"))
+    sampler.record(np.array([0]), np.array([40.0]))
+    assert sampler.interval() == (40.0, float("inf"))
+
+    values = np.array([20.0, 40.0, 60.0, 80.0])
+    sampler.record(np.arange(4), values)
+    mean, half = sampler.interval()
+    plain = Z_95 * values.std(ddof=1) / 2
+    assert mean == 50.0
+    assert half == pytest.approx(plain * np.sqrt(996 / 999))
+
+    # Every page scored: nothing left to estimate
+    whole = PageSampler(4)
+    whole.record(np.arange(4), values)
+    assert whole.interval() == (50.0, 0.0)
+
+
+def test_blank_pages_scale_the_population_to_the_whole_document():
+    sampler = PageSampler(100)
+    assert sampler.population == 100
+    sampler.record(np.arange(6), np.full(6, 50.0))
+    sampler.blank = 2
+    # A quarter of the pages read were blank, so about 75 of 100 pages have text
+    assert sampler.population == 75
+
+
+def test_done_after_enough_tight_pages_or_the_page_limit():
+    tight = PageSampler(200, min_pages=4, half_width=5)
+    tight.record(np.arange(3), np.full(3, 50.0))
+    assert not tight.done()
+    tight.record(np.arange(3, 4), np.array([50.0]))
+    assert tight.done()
+
+    spread = PageSampler(200, min_pages=4, max_pages=6, half_width=5)
+    spread.record(np.arange(5), np.array([0.0, 100.0, 0.0, 100.0, 0.0]))
+    assert not spread.done()
+    spread.record(np.array([5]), np.array([100.0]))
+    assert spread.done()
+
+
+def test_report_states_coverage_and_why_sampling_stopped():
+    sampler = PageSampler(200, min_pages=4, half_width=5)
+    sampler.record(np.array([9, 19, 29, 39]), np.array([70.0, 72.0, 71.0, 95.0]))
+    report = sampler.report()
+    assert report["score"] == 77 and report["structured"]
+    assert report["coverage"]["sampled"] == 4 and report["coverage"]["pages"] == 200
+    assert "p.40 (95%)" in report["observations"][-1]
+    assert report["reasoning"].endswith("the sampling limit was reached.")
+
+    sampler.record(np.array([49, 59]), np.array([71.0, 71.0]))
+    sampler.scores[39] = 71.0
+    assert sampler.report()["reasoning"].endswith("the interval was tight enough.")
+
+    empty = PageSampler(3)
+    empty.blank = 3
+    report = empty.report()
+    assert report["score"] is None and not report["structured"]
+    assert report["reasoning"].endswith("every page was read.")
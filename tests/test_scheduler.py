@@ -0,0 +1,110 @@
+import time
+import threading
+import pytest
+from core.scheduler import RequestScheduler, QueueFullError, INTERACTIVE, BULK
+
+
+def hold_slot(scheduler, priority, tenant, release, order=None):
+    """Starts a thread that takes a slot, records it in `order` and keeps it until `release` is set."""
+    def run():
+        with scheduler.slot(priority, tenant):
+            if order is not None:
+                order.append((priority, tenant))
+            release.wait(5)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_until(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_interactive_is_dispatched_before_bulk():
+    scheduler = RequestScheduler(max_concurrency=1, bulk_max_concurrency=1)
+    first, rest = threading.Event(), threading.Event()
+    order = []
+    hold_slot(scheduler, INTERACTIVE, "a", first)
+    wait_until(lambda: scheduler.metrics()[INTERACTIVE]["running"] == 1)
+    threads = [hold_slot(scheduler, BULK, "b", rest, order)]
+    wait_until(lambda: scheduler.metrics()[BULK]["queued"] == 1)
+    threads.append(hold_slot(scheduler, INTERACTIVE, "c", rest, order))
+    wait_until(lambda: scheduler.metrics()[INTERACTIVE]["queued"] == 1)
+
+    first.set()
+    wait_until(lambda: len(order) == 1)
+    rest.set()
+    for thread in threads:
+        thread.join(2)
+    assert order == [(INTERACTIVE, "c"), (BULK, "b")]
+
+
+def test_bulk_never_takes_every_slot():
+    scheduler = RequestScheduler(max_concurrency=2)
+    release = threading.Event()
+    threads = [hold_slot(scheduler, BULK, f"t{i}", release) for i in range(2)]
+    wait_until(lambda: scheduler.metrics()[BULK]["queued"] == 1)
+    assert scheduler.metrics()[BULK]["running"] == 1
+    # The remaining slot is free for interactive work right away
+    with scheduler.slot(INTERACTIVE, "u", timeout=0.5):
+        assert scheduler.metrics()[INTERACTIVE]["running"] == 1
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+
+def test_tenants_are_served_round_robin():
+    scheduler = RequestScheduler(max_concurrency=1)
+    gate, rest = threading.Event(), threading.Event()
+    order = []
+    hold_slot(scheduler, INTERACTIVE, "blocker", gate)
+    wait_until(lambda: scheduler.metrics()[INTERACTIVE]["running"] == 1)
+    threads = []
+    for tenant in ["a", "a", "a", "b"]:
+        threads.append(hold_slot(scheduler, INTERACTIVE, tenant, rest, order))
+        wait_until(lambda: scheduler.metrics()[INTERACTIVE]["queued"] == len(threads))
+
+    gate.set()
+    rest.set()
+    for thread in threads:
+        thread.join(2)
+    assert [tenant for _, tenant in order][:2] == ["a", "b"]
+
+
+def test_full_queue_rejects_and_counts():
+    scheduler = RequestScheduler(max_concurrency=1, max_queue_depth=1)
+    release = threading.Event()
+    threads = [hold_slot(scheduler, INTERACTIVE, "a", release), hold_slot(scheduler, INTERACTIVE, "b", release)]
+    wait_until(lambda: scheduler.metrics()[INTERACTIVE]["queued"] == 1)
+    with pytest.raises(QueueFullError):
+        with scheduler.slot(INTERACTIVE, "c"):
+            pass
+    assert scheduler.metrics()[INTERACTIVE]["rejected"] == 1
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+
+def test_queued_request_leaves_on_timeout_or_cancel():
+    scheduler = RequestScheduler(max_concurrency=1)
+    release = threading.Event()
+    thread = hold_slot(scheduler, INTERACTIVE, "a", release)
+    wait_until(lambda: scheduler.metrics()[INTERACTIVE]["running"] == 1)
+
+    with pytest.raises(QueueFullError, match="Waited"):
+        with scheduler.slot(INTERACTIVE, "b", timeout=0.1):
+            pass
+
+    cancelled = threading.Event()
+    threading.Timer(0.1, cancelled.set).start()
+    started = time.monotonic()
+    with pytest.raises(QueueFullError, match="cancelled"):
+        with scheduler.slot(INTERACTIVE, "b", timeout=5, cancelled=cancelled.is_set):
+            pass
+    assert time.monotonic() - started < 1
+    assert scheduler.metrics()[INTERACTIVE]["queued"] == 0
+    release.set()
+    thread.join(2)
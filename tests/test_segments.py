@@ -0,0 +1,57 @@
+import numpy as np
+from core import segments
+
+
+def pieces(text, spans):
+    return [text[start:end] for start, end in spans.tolist()]
+
+
+def test_sentences_split_on_western_and_cjk_punctuation():
+    text = "First one. Second one!  第三句。第四句？\n\nLast"
+    spans = segments.segment_text(text)
+    assert pieces(text, spans) == ["First one.", "Second one!", "第三句。", "第四句？", "Last"]
+
+
+def test_paragraphs_keep_inner_lines_and_drop_blank_gaps():
+    text = "\n  One.\nStill one.\n\n\n  Two.  \n"
+    spans = segments.segment_text(text, segments.PARAGRAPH)
+    assert pieces(text, spans) == ["One.\nStill one.", "Two."]
+    assert segments.segment_text("   \n\n ", segments.PARAGRAPH).shape == (0, 2)
+
+
+def test_long_inputs_are_merged_under_the_cap_without_losing_text():
+    text = " ".join(f"S{i}." for i in range(10))
+    spans = segments.segment_text(text, max_segments=3)
+    assert len(spans) == 3
+    assert spans[0, 0] == 0 and spans[-1, 1] == len(text)
+    # Merged spans stay in order and cover every sentence
+    assert " ".join(pieces(text, spans)) == text
+
+
+def test_numbered_text_uses_one_based_ids():
+    text = "A. B."
+    assert segments.numbered_text(text, segments.segment_text(text)) == "[1] A.\n[2] B."
+
+
+def test_align_scores_places_valid_ids_and_skips_the_rest():
+    scores = segments.align_scores(4, [
+        {"id": 1, "score": 80},
+        {"id": 3, "score": 150},  # clipped
+        {"id": 0, "score": 10},  # out of range
+        {"id": 5, "score": 10},  # out of range
+        {"id": 2.5, "score": 10},  # not an integer id
+        {"id": 4},  # no score
+        "junk",
+    ])
+    np.testing.assert_array_equal(scores, [80, np.nan, 100, np.nan])
+
+
+def test_align_scores_with_nothing_returned_is_all_nan():
+    assert np.isnan(segments.align_scores(3, [])).all()
+    assert np.isnan(segments.align_scores(2, None)).all()
+
+
+def test_weighted_score_weights_by_length_and_ignores_unscored():
+    spans = np.array([[0, 10], [10, 40], [40, 50]])
+    assert segments.weighted_score(spans, np.array([100.0, 0.0, np.nan])) == 25
+    assert segments.weighted_score(spans, np.full(3, np.nan)) is None
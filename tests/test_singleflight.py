@@ -0,0 +1,106 @@
+import time
+import threading
+from core.singleflight import SingleFlight
+
+
+class Upstream:
+    """A generator function that streams `chunks` one by one, each released by `step`."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = 0
+        self.step = threading.Semaphore(0)
+        self.closed = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        try:
+            for chunk in self.chunks:
+                self.step.acquire(timeout=5)
+                yield chunk
+        finally:
+            self.closed.set()
+
+
+def collect(flight, key, fn, results, name, stop=None, abandon=None):
+    def run():
+        stream = flight.stream(key, fn, stop=stop, abandon=abandon)
+        chunks = []
+        try:
+            while True:
+                chunks.append(next(stream))
+        except StopIteration as done:
+            results[name] = (chunks, done.value)
+        except Exception as e:
+            results[name] = (chunks, e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for_followers(flight, key, count, timeout=2.0):
+    end = time.monotonic() + timeout
+    while key not in flight._streams or flight._streams[key].followers < count:
+        assert time.monotonic() < end, "callers did not join"
+        time.sleep(0.01)
+
+
+def test_identical_calls_share_one_upstream_stream():
+    flight, upstream, results = SingleFlight(), Upstream(["a", "b", "c"]), {}
+    threads = [collect(flight, "k", upstream, results, name) for name in ("first", "second")]
+    wait_for_followers(flight, "k", 2)
+    for _ in upstream.chunks:
+        upstream.step.release()
+    for thread in threads:
+        thread.join(2)
+    assert upstream.calls == 1
+    assert results["first"] == (["a", "b", "c"], True)
+    assert results["second"] == (["a", "b", "c"], True)
+
+
+def test_one_caller_stopping_does_not_affect_the_others():
+    flight, upstream, results = SingleFlight(), Upstream(["a", "b"]), {}
+    stopped, abandoned = threading.Event(), threading.Event()
+    leaver = collect(flight, "k", upstream, results, "leaver", stop=stopped.is_set, abandon=abandoned.set)
+    stayer = collect(flight, "k", upstream, results, "stayer")
+    wait_for_followers(flight, "k", 2)
+    upstream.step.release()
+    stopped.set()
+    leaver.join(2)
+    upstream.step.release()
+    stayer.join(2)
+
+    assert results["leaver"][1] is False
+    assert results["stayer"] == (["a", "b"], True)
+    assert not abandoned.is_set()
+
+
+def test_call_is_abandoned_once_every_caller_left():
+    flight, upstream, results = SingleFlight(), Upstream(["a", "b"]), {}
+    stopped, abandoned = threading.Event(), threading.Event()
+    caller = collect(flight, "k", upstream, results, "only", stop=stopped.is_set, abandon=abandoned.set)
+    stopped.set()
+    caller.join(2)
+    assert abandoned.wait(2)
+
+    # A late arrival starts a fresh call instead of joining the abandoned one
+    fresh, late = Upstream(["x"]), {}
+    fresh.step.release()
+    upstream.step.release()
+    collect(flight, "k", fresh, late, "late").join(2)
+    assert late["late"] == (["x"], True)
+    assert upstream.closed.wait(2)
+
+
+def test_upstream_error_reaches_every_caller():
+    def failing():
+        yield "a"
+        raise ValueError("boom")
+
+    flight, results = SingleFlight(), {}
+    for thread in [collect(flight, "k", failing, results, name) for name in ("first", "second")]:
+        thread.join(2)
+    for name in ("first", "second"):
+        chunks, error = results[name]
+        assert isinstance(error, ValueError)
+        assert chunks in ([], ["a"])